@@ -1,54 +1,48 @@
-import os
 import google.generativeai as genai
 from schemas.message_artifact import MessageArtifact
-from dotenv import load_dotenv
-import json
-from typing import Dict, Any
+from schemas.agent_outputs import ExtractorOutput
+from services.gemini_models import get_model
+from services.llm_cache import llm_cache
+from typing import Dict, Any, Union
 
-load_dotenv()
+MODEL_NAME = 'gemini-2.5-flash'
+
+STATIC_PROMPT_PREFIX = """
+You are a security extractor agent. Analyze the message artifact provided by the user for scam indicators.
+
+Task:
+Identify specific indicators of urgency, requested actions, brand impersonation, and sender mismatches.
+
+Field notes:
+urgency_type e.g. "account_suspension", "limited_time_offer", "none". requested_actions from "login", "payment", "download", "reply", "otp", ... language_tone e.g. "threatening", "professional", "casual".
+"""
+
+GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=ExtractorOutput
+)
 
 class ExtractorAgent:
-    def __init__(self):
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+    @property
+    def model(self) -> genai.GenerativeModel:
+        return get_model(MODEL_NAME, STATIC_PROMPT_PREFIX)
 
-    def analyze(self, artifact: MessageArtifact) -> Dict[str, Any]:
+    def analyze(self, artifact: Union[MessageArtifact, str]) -> Dict[str, Any]:
         """
-        Analyzes the MessageArtifact for security indicators.
+        Analyzes the MessageArtifact (or its already-serialized JSON) for security indicators.
         """
-        prompt = f"""
-        You are a security extractor agent. Analyze the following message artifact for scam indicators.
-        
-        Message:
-        {artifact.model_dump_json()}
-        
-        Task:
-        Identify specific indicators of urgency, requested actions, brand impersonation, and sender mismatches.
-        
-        Output JSON Schema:
-        {{
-            "urgency_detected": bool,
-            "urgency_type": "...", # e.g., "account_suspension", "limited_time_offer", "none"
-            "requested_actions": ["login", "payment", "download", "reply", "otp", ...],
-            "brand_impersonation": {{
-                "detected": bool,
-                "brand_name": "...",
-                "evidence": "..."
-            }},
-            "sender_mismatch": {{
-                "detected": bool,
-                "explanation": "..."
-            }},
-            "language_tone": "..." # e.g., "threatening", "professional", "casual"
-        }}
-        
-        Return ONLY valid JSON.
-        """
-        
-        response = self.model.generate_content(prompt)
+        artifact_json = artifact if isinstance(artifact, str) else artifact.model_dump_json()
+        prompt = f"Message: {artifact_json}"
+
         try:
-            text = response.text.replace("```json", "").replace("```", "").strip()
-            return json.loads(text)
+            return self._generate(prompt)
         except Exception as e:
             print(f"Error parsing Extractor response: {e}")
             return {"error": str(e)}
+
+    @llm_cache(ttl=86400, context=(MODEL_NAME, STATIC_PROMPT_PREFIX, ExtractorOutput))
+    def _generate(self, prompt: str) -> Dict[str, Any]:
+        response = self.model.generate_content(prompt, generation_config=GENERATION_CONFIG)
+        return ExtractorOutput.model_validate_json(response.text).model_dump()
+
+INSTANCE = ExtractorAgent()
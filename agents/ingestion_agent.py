@@ -1,68 +1,192 @@
 import os
+import re
+import threading
 import google.generativeai as genai
-from schemas.message_artifact import MessageArtifact
-from dotenv import load_dotenv
-import json
+import phonenumbers
+from bs4 import BeautifulSoup
+from email.utils import parseaddr
+from langdetect import detect, DetectorFactory, LangDetectException
+from schemas.message_artifact import MessageArtifact, SenderInfo, BodyContent, ExtractedEntities
+from services.gemini_models import get_model
+from services.llm_cache import llm_cache
+import orjson
+from typing import Dict, Any, List, Tuple
 
-load_dotenv()
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Same parser choice as the MCP fetch tool: lxml when installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# langdetect is randomized unless seeded
+DetectorFactory.seed = 0
+
+URL_RE = re.compile(r"https?://[^\s<>\"']+")
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# Leading "Header: value" lines of a pasted email
+HEADER_RE = re.compile(r"^(subject|from|to|cc|reply-to|sender|date)\s*:\s*(.*)$", re.IGNORECASE)
+URL_TRAILING_PUNCTUATION = ".,;:!?)]}"
+
+# Hyperscan scans ASCII text for URLs and emails in a single DFA pass, where its
+# ASCII \w matches exactly what re's Unicode \w does; other text uses stdlib re.
+# (Unicode \w with leftmost start of match is too large for hyperscan to compile.)
+_URL_ID, _EMAIL_ID = 0, 1
+_HS_DB = None
+_HS_LOCAL = threading.local()  # Per-thread scratch space, which hyperscan requires
+if hyperscan is not None:
+    _HS_DB = hyperscan.Database()
+    _HS_DB.compile(
+        expressions=[URL_RE.pattern.encode(), EMAIL_RE.pattern.encode()],
+        ids=[_URL_ID, _EMAIL_ID],
+        elements=2,
+        flags=[hyperscan.HS_FLAG_SOM_LEFTMOST] * 2
+    )
+
+# Default region for phone numbers written without a country code
+PHONE_REGION = os.getenv("PHONE_REGION", "US")
+
+MODEL_NAME = 'gemini-2.5-flash'
+
+STATIC_PROMPT_PREFIX = """
+You are an expert data ingestion agent.
+Your task is to parse the raw text provided by the user into a structured JSON object matching the MessageArtifact schema.
+
+Output Schema (JSON):
+{"source_type": str, "sender": {"display_name": str, "email": str, "phone": str}, "subject": str, "body": {"original_text": str, "clean_text": str}, "extracted_entities": {"urls": [str], "emails": [str], "phones": [str]}, "metadata": {"language": str, "platform": str}}
+source_type is the Source Type given with the input.
+
+Instructions:
+1. Extract sender info if available.
+2. Clean the body text (remove HTML tags, signatures, noise).
+3. Extract all URLs, emails, and phone numbers into extracted_entities.
+4. Detect language.
+"""
+
+# MessageArtifact.metadata is free-form, so only JSON mode is requested here
+GENERATION_CONFIG = genai.GenerationConfig(response_mime_type="application/json")
 
 class IngestionAgent:
-    def __init__(self):
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+    @property
+    def model(self) -> genai.GenerativeModel:
+        return get_model(MODEL_NAME, STATIC_PROMPT_PREFIX)
 
     def process(self, raw_text: str, source_type: str = "email") -> MessageArtifact:
         """
         Ingests raw text and returns a structured MessageArtifact.
+        Parsing is deterministic; set USE_LLM_INGESTION=true to use Gemini instead.
         """
+        if os.getenv("USE_LLM_INGESTION", "").lower() == "true":
+            return self._process_llm(raw_text, source_type)
+
+        headers, body = self._split_headers(raw_text)
+
+        clean_text = body
+        if "<" in body and ">" in body:
+            clean_text = BeautifulSoup(body, HTML_PARSER).get_text()
+        clean_text = re.sub(r"\n\s*\n\s*\n+", "\n\n", clean_text).strip()
+
+        display_name, email = parseaddr(headers.get("from", ""))
+        urls, emails = _scan_urls_and_emails(raw_text)
+
+        try:
+            language = detect(clean_text)
+        except LangDetectException:
+            language = "unknown"
+
+        return MessageArtifact(
+            source_type=source_type,
+            sender=SenderInfo(display_name=display_name or None, email=email or None),
+            subject=headers.get("subject"),
+            body=BodyContent(original_text=body, clean_text=clean_text),
+            extracted_entities=ExtractedEntities(
+                urls=_unique(url.rstrip(URL_TRAILING_PUNCTUATION) for url in urls),
+                emails=_unique(emails),
+                phones=_unique(m.raw_string for m in phonenumbers.PhoneNumberMatcher(clean_text, PHONE_REGION))
+            ),
+            metadata={"language": language, "platform": source_type}
+        )
+
+    def _split_headers(self, raw_text: str) -> Tuple[Dict[str, str], str]:
+        """
+        Splits leading email headers (Subject, From, ...) from the message body.
+        """
+        lines = raw_text.strip().splitlines()
+        headers = {}
+        i = 0
+        while i < len(lines):
+            match = HEADER_RE.match(lines[i].strip())
+            if not match:
+                break
+            headers[match.group(1).lower()] = match.group(2).strip()
+            i += 1
+        body = "\n".join(lines[i:]).strip()
+        return headers, body or raw_text.strip()
+
+    def _process_llm(self, raw_text: str, source_type: str) -> MessageArtifact:
         prompt = f"""
-        You are an expert data ingestion agent.
-        Your task is to parse the following raw text into a structured JSON object matching the MessageArtifact schema.
-        
+        Source Type: {source_type}
+
         Input Text:
         {raw_text}
-        
-        Source Type: {source_type}
-        
-        Output Schema (JSON):
-        {{
-            "source_type": "{source_type}",
-            "sender": {{
-                "display_name": "...",
-                "email": "...",
-                "phone": "..."
-            }},
-            "subject": "...",
-            "body": {{
-                "original_text": "...",
-                "clean_text": "..." 
-            }},
-            "extracted_entities": {{
-                "urls": ["..."],
-                "emails": ["..."],
-                "phones": ["..."]
-            }},
-            "metadata": {{
-                "language": "...",
-                "platform": "..."
-            }}
-        }}
-        
-        Instructions:
-        1. Extract sender info if available.
-        2. Clean the body text (remove HTML tags, signatures, noise).
-        3. Extract all URLs, emails, and phone numbers into extracted_entities.
-        4. Detect language.
-        5. Return ONLY valid JSON.
         """
-        
-        response = self.model.generate_content(prompt)
+
         try:
-            # Clean up potential markdown code blocks
-            text = response.text.replace("```json", "").replace("```", "").strip()
-            data = json.loads(text)
+            data = self._generate(prompt)
             return MessageArtifact(**data)
         except Exception as e:
             print(f"Error parsing Gemini response: {e}")
             # Fallback or re-raise
             raise e
+
+    # The output schema is spelled out in the prefix itself
+    @llm_cache(ttl=86400, context=(MODEL_NAME, STATIC_PROMPT_PREFIX))
+    def _generate(self, prompt: str) -> Dict[str, Any]:
+        response = self.model.generate_content(prompt, generation_config=GENERATION_CONFIG)
+        return orjson.loads(response.text)
+
+def _scan_urls_and_emails(text: str) -> Tuple[List[str], List[str]]:
+    """
+    Returns (urls, emails) found in text, in order of appearance.
+    """
+    if _HS_DB is None or not text.isascii():
+        return URL_RE.findall(text), EMAIL_RE.findall(text)
+    return _hs_scan(text)
+
+def _hs_scan(text: str) -> Tuple[List[str], List[str]]:
+    # (urls, emails) in ASCII text from one pass over _HS_DB
+    scratch = getattr(_HS_LOCAL, "scratch", None)
+    if scratch is None:
+        scratch = _HS_LOCAL.scratch = hyperscan.Scratch(_HS_DB)
+
+    # Hyperscan reports every end offset of a match; keep the longest per start
+    data = text.encode("ascii")
+    spans: Dict[Tuple[int, int], int] = {}
+
+    def on_match(pattern_id, start, end, flags, context):
+        key = (pattern_id, start)
+        if end > spans.get(key, -1):
+            spans[key] = end
+
+    _HS_DB.scan(data, match_event_handler=on_match, scratch=scratch)
+
+    # Drop matches nested inside an earlier one, as re.findall would
+    found = {_URL_ID: [], _EMAIL_ID: []}
+    last_end = {_URL_ID: -1, _EMAIL_ID: -1}
+    for (pattern_id, start), end in sorted(spans.items(), key=lambda item: item[0][1]):
+        if start < last_end[pattern_id]:
+            continue
+        found[pattern_id].append(data[start:end].decode("ascii"))
+        last_end[pattern_id] = end
+    return found[_URL_ID], found[_EMAIL_ID]
+
+def _unique(items) -> List[str]:
+    # De-duplicates while keeping first-seen order
+    return list(dict.fromkeys(items))
+
+INSTANCE = IngestionAgent()
@@ -1,108 +1,209 @@
 import os
+import atexit
+import threading
 import google.generativeai as genai
-from schemas.message_artifact import MessageArtifact
-from dotenv import load_dotenv
-import json
+from schemas.agent_outputs import LinkBatch
+from services.gemini_models import get_model
+from services.llm_cache import llm_cache
+from services.prompt_utils import truncate_evidence
+import orjson
+import asyncio
 import httpx
-from typing import Dict, Any, List
+from cachetools import TTLCache
+from typing import Dict, Any, List, Optional
 from urllib.parse import urlparse
 
-load_dotenv()
+# Upper bound on URLs whose MCP evidence is collected at the same time
+MAX_CONCURRENT_URLS = 8
+# Characters of fetched HTML, and of any other evidence string, passed to the model
+MAX_PROMPT_HTML = 4096
+MAX_PROMPT_TEXT = 2048
+
+MODEL_NAME = 'gemini-2.5-flash'
+
+MCP_URL = os.getenv("MCP_URL", "http://localhost:5000")
+
+# One pooled client for every MCP call in the process, so keep-alive connections
+# are reused across URLs and requests instead of re-opened per call
+_MCP = httpx.Client(
+    limits=httpx.Limits(max_connections=500, max_keepalive_connections=100),
+    timeout=30.0
+)
+atexit.register(_MCP.close)
+
+# Successful MCP results reused across analyses: endpoint -> (cache, payload key)
+# WHOIS barely changes within a day; pages are only reused for a few minutes
+_MCP_CACHES = {
+    "whois": (TTLCache(maxsize=10000, ttl=86400), "domain"),
+    "fetch": (TTLCache(maxsize=5000, ttl=300), "url")
+}
+_MCP_CACHE_LOCK = threading.Lock()
+
+STATIC_PROMPT_PREFIX = """
+You are a Link Analyzer Agent. Extract factual observations from the technical evidence provided by the user for a list of URLs.
+
+Task:
+For each evidence object, analyze the evidence and populate the "facts" object of its result using ONLY verifiable data from that object's inputs.
+Return exactly one entry in "results" per evidence object, in the same order, with "url" copied from the evidence.
+
+IMPORTANT HANDLING OF ERRORS:
+- If any input (fetch, signals, whois) contains an "error" field, do NOT fail.
+- Instead, add the error message to "technical_errors" in the output.
+- Extract as much valid data as possible from the non-failed inputs.
+- For example, if Whois fails but Fetch succeeds, still report the redirect chain and page signals.
+
+Do NOT make ANY judgments about risk (safe/malicious).
+Do NOT use words like "suspicious", "phishing", or "safe".
+Do NOT assign a risk score.
+
+Field notes:
+agent is always "LinkAnalyzerAgent". reachability is "reachable" or "unreachable".
+"""
+
+GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=LinkBatch
+)
 
 class LinkAnalyzerAgent:
-    def __init__(self, mcp_url="http://localhost:5000"):
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel('gemini-2.5-pro')
+    def __init__(self, mcp_url=MCP_URL):
         self.mcp_url = mcp_url
 
-    def _call_mcp(self, endpoint: str, payload: Dict) -> Dict:
+    @property
+    def model(self) -> genai.GenerativeModel:
+        return get_model(MODEL_NAME, STATIC_PROMPT_PREFIX)
+
+    async def _call_mcp(self, endpoint: str, payload: Dict) -> Dict:
+        # httpx.Client is thread-safe; worker threads let calls overlap on the shared pool
+        return await asyncio.to_thread(self._post_mcp, endpoint, payload)
+
+    def _post_mcp(self, endpoint: str, payload: Dict) -> Dict:
+        cache, key_field = _MCP_CACHES.get(endpoint, (None, None))
+        key = payload.get(key_field) if cache is not None else None
+        if key is not None:
+            with _MCP_CACHE_LOCK:
+                cached = cache.get(key)
+            if cached is not None:
+                return cached
+
         try:
-            response = httpx.post(f"{self.mcp_url}/mcp/{endpoint}", json=payload, timeout=30.0)
-            return response.json()
+            response = _MCP.post(f"{self.mcp_url}/mcp/{endpoint}", json=payload)
+            result = response.json()
         except Exception as e:
             return {"error": str(e)}
 
-    def analyze(self, urls: List[str]) -> List[Dict[str, Any]]:
+        if key is not None and "error" not in result:
+            with _MCP_CACHE_LOCK:
+                cache[key] = result
+        return result
+
+    async def analyze(self, urls: List[str]) -> List[Dict[str, Any]]:
         """
         Analyzes a list of URLs using MCP tools and Gemini reasoning.
+        Evidence for all URLs is collected concurrently, then analyzed in a single
+        Gemini call; the returned findings keep the input order.
         """
-        findings = []
-        
-        for url in urls:
-            # 1. Fetch URL
-            fetch_result = self._call_mcp("fetch", {"url": url})
-            
-            # 2. Extract Signals
-            signals_result = self._call_mcp("signals", {
-                "url": url, 
+        if not urls:
+            return []
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_URLS)
+        # URLs on the same domain share one in-flight whois lookup
+        whois_tasks: Dict[str, asyncio.Future] = {}
+
+        async def bounded(url: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._collect_evidence(url, whois_tasks)
+
+        evidence = await asyncio.gather(*(bounded(url) for url in urls))
+
+        # Gemini Analysis of Technical Evidence (one call for every URL)
+        prompt_evidence = [
+            truncate_evidence({
+                "url": item["url"],
+                # Only the fetch fields the model reasons about; raw headers are left out
+                "fetch": {
+                    "status": item["fetch"].get("status_code"),
+                    "final_url": item["fetch"].get("final_url"),
+                    "redirects": item["fetch"].get("redirect_chain"),
+                    "html": item["fetch"].get("html_content") or "",
+                    "error": item["fetch"].get("error")
+                },
+                "signals": item["signals"],
+                "whois": item["whois"]
+            }, max_html=MAX_PROMPT_HTML, max_text=MAX_PROMPT_TEXT, source=item["url"])
+            for item in evidence
+        ]
+        prompt = f"Evidence: {orjson.dumps(prompt_evidence, default=str).decode()}"
+
+        try:
+            results = await self._generate(prompt)
+        except Exception as e:
+            return [self._error_finding(item, str(e)) for item in evidence]
+
+        return [
+            result or self._error_finding(item, "No analysis returned for URL")
+            for item, result in zip(evidence, _match_results(evidence, results))
+        ]
+
+    async def _collect_evidence(self, url: str, whois_tasks: Dict[str, asyncio.Future]) -> Dict[str, Any]:
+        domain = urlparse(url).netloc
+
+        # 1. Fetch URL and Whois Lookup (on domain) run concurrently
+        fetch_task = asyncio.ensure_future(self._call_mcp("fetch", {"url": url}))
+        if domain not in whois_tasks:
+            whois_tasks[domain] = asyncio.ensure_future(self._call_mcp("whois", {"domain": domain}))
+        whois_task = whois_tasks[domain]
+
+        # 2. Extract Signals (needs the fetched HTML)
+        fetch_result = await fetch_task
+        signals_result, whois_result = await asyncio.gather(
+            self._call_mcp("signals", {
+                "url": url,
                 "html_content": fetch_result.get("html_content", "")
-            })
-            
-            # 3. Whois Lookup (on domain)
-            domain = urlparse(url).netloc
-            whois_result = self._call_mcp("whois", {"domain": domain})
-            
-            # 4. Gemini Analysis of Technical Evidence
-            prompt = f"""
-            You are a Link Analyzer Agent. Extract factual observations from the provided technical evidence for a specific URL.
-
-            URL: {url}
-
-            Fetch Result:
-            {json.dumps(fetch_result, default=str)}
-
-            Page Signals:
-            {json.dumps(signals_result, default=str)}
-
-            Whois Result:
-            {json.dumps(whois_result, default=str)}
-
-            Task:
-            Analyze the evidence and populate the "facts" object in the output using ONLY verifiable data from the inputs.
-            
-            IMPORTANT HANDLING OF ERRORS:
-            - If any input (Fetch, Signals, Whois) contains an "error" field, do NOT fail.
-            - Instead, add the error message to "technical_errors" in the output.
-            - Extract as much valid data as possible from the non-failed inputs.
-            - For example, if Whois fails but Fetch succeeds, still report the redirect chain and page signals.
-
-            Do NOT make ANY judgments about risk (safe/malicious).
-            Do NOT use words like "suspicious", "phishing", or "safe".
-            Do NOT assign a risk score.
-
-            Output JSON Schema:
-            {{
-                "agent": "LinkAnalyzerAgent",
-                "url": "{url}",
-                "facts": {{
-                    "domain_age_days": int | null,
-                    "registrar": "string | null",
-                    "privacy_protection": bool | null,
-                    "redirect_chain": ["url1", "url2"],
-                    "redirect_count": int,
-                    "login_form_detected": bool,
-                    "password_field_detected": bool,
-                    "brand_keywords_found": ["list", "of", "brands", "found"],
-                    "reachability": "reachable" or "unreachable",
-                    "technical_errors": ["list", "of", "errors"]
-                }}
-            }}
-            """
-            
-            try:
-                response = self.model.generate_content(prompt)
-                text = response.text.replace("```json", "").replace("```", "").strip()
-                analysis = json.loads(text)
-                findings.append(analysis)
-            except Exception as e:
-                findings.append({
-                    "url": url,
-                    "error": str(e),
-                    "raw_evidence": {
-                        "fetch": fetch_result,
-                        "signals": signals_result,
-                        "whois": whois_result
-                    }
-                })
-                
-        return findings
+            }),
+            whois_task
+        )
+
+        return {
+            "url": url,
+            "fetch": fetch_result,
+            "signals": signals_result,
+            "whois": whois_result
+        }
+
+    def _error_finding(self, evidence: Dict[str, Any], error: str) -> Dict[str, Any]:
+        return {
+            "url": evidence["url"],
+            "error": error,
+            "raw_evidence": {
+                "fetch": evidence["fetch"],
+                "signals": evidence["signals"],
+                "whois": evidence["whois"]
+            }
+        }
+
+    @llm_cache(ttl=86400, context=(MODEL_NAME, STATIC_PROMPT_PREFIX, LinkBatch))
+    async def _generate(self, prompt: str) -> List[Dict[str, Any]]:
+        # The SDK's async client is bound to the loop it was first used on, and each
+        # pipeline run gets a fresh loop from asyncio.run; the sync call in a worker
+        # thread works from any loop
+        response = await asyncio.to_thread(self.model.generate_content, prompt, generation_config=GENERATION_CONFIG)
+        return LinkBatch.model_validate_json(response.text).model_dump()["results"]
+
+def _match_results(evidence: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    # Pairs each evidence item with the result for its URL, whatever order the
+    # model returned them in; a result whose URL matches no item (e.g. rewritten
+    # by the model) only fills the position it was returned at
+    by_url: Dict[str, List[Dict[str, Any]]] = {}
+    for result in results:
+        by_url.setdefault(result.get("url"), []).append(result)
+    matched = [by_url[item["url"]].pop(0) if by_url.get(item["url"]) else None for item in evidence]
+
+    evidence_urls = {item["url"] for item in evidence}
+    for position, item in enumerate(evidence):
+        if matched[position] is None and position < len(results) \
+                and results[position].get("url") not in evidence_urls:
+            matched[position] = dict(results[position], url=item["url"])
+    return matched
+
+INSTANCE = LinkAnalyzerAgent()
@@ -1,56 +1,73 @@
-import os
-import google.generativeai as genai
-from dotenv import load_dotenv
-import json
-from typing import Dict, Any
+from services.gemini_models import get_model
+from services.prompt_utils import truncate_evidence
+from agents.scoring_agent import is_high_stakes
+import orjson
+from typing import Dict
 
-load_dotenv()
+MODEL_NAME = 'gemini-2.5-flash'
+FALLBACK_MODEL_NAME = 'gemini-2.5-pro'
 
-class ReportAgent:
-    def __init__(self):
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel('gemini-2.5-pro')
+# Bounds on the link evidence embedded in the prompt
+MAX_REPORT_FINDINGS = 20
+MAX_FINDING_TEXT = 2048
+
+STATIC_PROMPT_PREFIX = """
+You are a Report Agent. Generate a clear, helpful, and explainable security report for a non-technical user from the input data provided by the user.
+
+Structure:
+# 🚨 Scam Risk Analysis Report
+
+## Summary
+[Risk Score] - [Severity Label]
+[Brief explanation]
+
+## 🔍 Key Evidence
+- Bullet points of PROVEN facts (e.g., "Domain registered 2 days ago", "Login form on non-official site").
+
+## 🛡️ What To Do Now
+- Specific advice based on the threat type.
+
+## ⚠️ If You Already Clicked
+- Mitigation steps.
 
-    def generate_report(self, 
-                        message_artifact: Dict, 
-                        risk_assessment: Dict, 
+Tone: Professional, calm, authoritative but helpful.
+Format: Markdown.
+"""
+
+class ReportAgent:
+    def generate_report(self,
+                        message_artifact: Dict,
+                        risk_assessment: Dict,
                         link_findings: list,
                         indicators: Dict) -> str:
         """
         Generates a human-readable markdown report.
         """
+        if len(link_findings) > MAX_REPORT_FINDINGS:
+            print(f"[Prompt] Reporting on the first {MAX_REPORT_FINDINGS} of {len(link_findings)} link findings")
+        # Error findings carry raw evidence, including fetched HTML
+        prompt_findings = truncate_evidence(
+            link_findings[:MAX_REPORT_FINDINGS],
+            max_html=MAX_FINDING_TEXT,
+            max_text=MAX_FINDING_TEXT,
+            source="link findings"
+        )
+
         prompt = f"""
-        You are a Report Agent. Generate a clear, helpful, and explainable security report for a non-technical user.
-        
         Input Data:
         - Message Sender: {message_artifact.get('sender')}
         - Subject: {message_artifact.get('subject')}
-        - Risk Assessment: {json.dumps(risk_assessment, indent=2)}
-        - Link Findings: {json.dumps(link_findings, indent=2)}
-        - Indicators: {json.dumps(indicators, indent=2)}
-        
-        Structure:
-        # 🚨 Scam Risk Analysis Report
-        
-        ## Summary
-        [Risk Score] - [Severity Label]
-        [Brief explanation]
-        
-        ## 🔍 Key Evidence
-        - Bullet points of PROVEN facts (e.g., "Domain registered 2 days ago", "Login form on non-official site").
-        
-        ## 🛡️ What To Do Now
-        - Specific advice based on the threat type.
-        
-        ## ⚠️ If You Already Clicked
-        - Mitigation steps.
-        
-        Tone: Professional, calm, authoritative but helpful.
-        Format: Markdown.
+        - Risk Assessment: {orjson.dumps(risk_assessment).decode()}
+        - Link Findings: {orjson.dumps(prompt_findings).decode()}
+        - Indicators: {orjson.dumps(indicators).decode()}
         """
-        
+
+        model_name = FALLBACK_MODEL_NAME if is_high_stakes(indicators, link_findings) else MODEL_NAME
+
         try:
-            response = self.model.generate_content(prompt)
+            response = get_model(model_name, STATIC_PROMPT_PREFIX).generate_content(prompt)
             return response.text
         except Exception as e:
             return f"Error generating report: {e}"
+
+INSTANCE = ReportAgent()
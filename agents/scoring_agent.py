@@ -1,76 +1,179 @@
-import os
-import google.generativeai as genai
-from dotenv import load_dotenv
-import json
+from schemas.agent_outputs import RiskAssessment
 from typing import Dict, Any, List
+from urllib.parse import urlparse
 
-load_dotenv()
+try:
+    import tldextract
+    # Bundled public suffix list snapshot only; never fetched at runtime
+    _EXTRACT = tldextract.TLDExtract(suffix_list_urls=())
+except ImportError:
+    _EXTRACT = None
 
-class ScoringAgent:
-    def __init__(self):
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = genai.GenerativeModel('gemini-2.5-pro')
+# Fallback for multi-part suffixes such as co.uk / com.au without tldextract
+_SECOND_LEVEL_SUFFIXES = ("co", "com", "net", "org", "gov", "ac", "edu")
+
+# Brands recognized as a hostname label ("paypal-verify.com" claims PayPal)
+HOST_BRANDS = ("paypal", "google", "microsoft", "apple", "facebook", "instagram", "netflix", "amazon", "chase", "wellsfargo")
+# Words that name a kind of business rather than one brand, so no domain can be
+# official or mismatched for them
+GENERIC_BRANDS = ("bank",)
+
+# Points added once per risk factor found in the message or any of its links
+RISK_WEIGHTS = {
+    "credential_harvest": 60,   # Password field on a domain not official for the claimed brand
+    "young_domain": 40,         # Domain registered < 30 days ago
+    "mismatched_domain": 30,    # Brand name in subdomain/path but not in the root domain
+    "brand_impersonation": 25,
+    "sender_mismatch": 20,
+    "urgency": 15,
+    "login_form": 15,
+    "sensitive_action": 10,     # Asks to log in, pay, send an OTP or download
+    "hidden_whois": 10,
+    "redirect_chain": 10        # Two or more redirects
+}
+
+YOUNG_DOMAIN_DAYS = 30
+SENSITIVE_ACTIONS = ("login", "payment", "otp", "download")
 
+# (upper bound, severity label), following the 0-20 / 21-50 / 51-80 / 81-100 bands
+SEVERITY_BANDS = ((0, "Safe"), (20, "Low"), (50, "Medium"), (80, "High"), (100, "Critical"))
+
+def is_high_stakes(indicators: Dict[str, Any], link_findings: List[Dict[str, Any]]) -> bool:
+    """
+    True when the message impersonates a brand and a linked page collects passwords.
+    """
+    if not (indicators.get("brand_impersonation") or {}).get("detected"):
+        return False
+    return any((finding.get("facts") or {}).get("password_field_detected") for finding in link_findings)
+
+class ScoringAgent:
     def calculate_score(self, indicators: Dict[str, Any], link_findings: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
-        Calculates the final risk score and classification.
+        Calculates the final risk score and classification with a weighted rule table.
+        Returns an "Unknown" assessment when an upstream stage failed, since missing
+        evidence must not read as a safe message.
         """
-        prompt = f"""
-        You are a Risk Scoring Agent. Calculate a scam risk score (0-100) based on the provided indicators and link analysis facts.
-
-        Extractor Indicators:
-        {json.dumps(indicators, indent=2)}
-
-        Link Analysis Facts (Array of objects):
-        {json.dumps(link_findings, indent=2)}
-
-        Task:
-        1. Analyze the "facts" for each link to determine its risk.
-           - Young domain (< 30 days) -> High Risk
-           - Mismatched domain (e.g. brand name in subdomain/path but not root) -> High Risk
-           - Login form + Password field on non-official domain -> Critical Risk (Credential Harvesting)
-           - Hidden/Redacted Whois -> Medium Risk factor
-        2. Combine link risk with Extractor indicators (Urgency, Brand Mismatches).
-        3. Assign a final score and severity.
-
-        Scoring Rules:
-        - 0-20: Safe / Low Risk
-        - 21-50: Suspicious / Medium Risk
-        - 51-80: High Risk
-        - 81-100: Critical / Confirmed Scam
-
-        Output JSON Schema:
-        {{
-            "risk_score": int,
-            "severity_label": "Safe/Low/Medium/High/Critical",
-            "scam_type": "Phishing/AdvanceFee/TechSupport/None/...",
-            "reasons": ["reason 1", "reason 2", ...],
-            "explanation": "Short summary of why this score was given.",
-            "recommended_actions": [
-                {{
-                    "title": "Action Title (e.g. Block Sender)",
-                    "priority": "high/med/low",
-                    "detail": "Why this action is needed."
-                }}
-            ]
-        }}
-        """
-        
-        try:
-            response = self.model.generate_content(prompt)
-            if not response.text:
-                raise ValueError("Empty response from Gemini")
-            text = response.text.replace("```json", "").replace("```", "").strip()
-            return json.loads(text)
-        except Exception as e:
-            print(f"ScoringAgent Error: {e}")
-            return {
-                "risk_score": 0,
-                "severity_label": "Unknown",
-                "scam_type": "Unknown",
-                "reasons": [f"AI Error: {str(e)}"],
-                "explanation": "Failed to generate risk score.",
-                "recommended_actions": []
-            }
-        except Exception as e:
-            return {"error": str(e)}
+        errors = _upstream_errors(indicators, link_findings)
+        if errors:
+            return RiskAssessment(
+                risk_score=0,
+                severity_label="Unknown",
+                scam_type="Unknown",
+                reasons=errors,
+                explanation="Failed to generate risk score.",
+                recommended_actions=[]
+            ).model_dump()
+
+        reasons: Dict[str, str] = {}  # factor -> first reason found for it
+
+        def flag(factor: str, reason: str):
+            reasons.setdefault(factor, reason)
+
+        # 1. Message indicators (Urgency, Brand Mismatches)
+        impersonation = indicators.get("brand_impersonation") or {}
+        brand = impersonation.get("brand_name") if impersonation.get("detected") else None
+        if impersonation.get("detected"):
+            flag("brand_impersonation", f"Message impersonates {brand or 'a known brand'}")
+        if (indicators.get("sender_mismatch") or {}).get("detected"):
+            flag("sender_mismatch", "Sender identity does not match the claimed organization")
+        if indicators.get("urgency_detected"):
+            flag("urgency", "Message uses urgency or pressure tactics")
+        actions = [a for a in indicators.get("requested_actions") or [] if a in SENSITIVE_ACTIONS]
+        if actions:
+            flag("sensitive_action", f"Message asks you to: {', '.join(actions)}")
+
+        # 2. Link facts
+        for finding in link_findings:
+            facts = finding.get("facts") or {}
+            url = finding.get("url") or ""
+            host = (urlparse(url).hostname or "").lower()
+            claimed = _claimed_brand(brand, host)
+
+            age = facts.get("domain_age_days")
+            if age is not None and 0 <= age < YOUNG_DOMAIN_DAYS:
+                flag("young_domain", f"Domain {host} was registered {age} days ago")
+
+            if claimed and _is_mismatched(url, host, claimed):
+                flag("mismatched_domain", f"{host} uses a brand name outside its root domain")
+
+            if facts.get("password_field_detected") and claimed and not _is_official(host, claimed):
+                # Page keywords only back up the claim; they never name the brand
+                mentioned = _brand_token(claimed) in (facts.get("brand_keywords_found") or [])
+                flag("credential_harvest", f"Password form on {host}, which is not an official {claimed} domain"
+                     + (f" (the page mentions {claimed})" if mentioned else ""))
+            elif facts.get("login_form_detected"):
+                flag("login_form", f"Login form detected on {host}")
+
+            if facts.get("privacy_protection"):
+                flag("hidden_whois", f"Owner of {host} is hidden behind WHOIS privacy")
+            if (facts.get("redirect_count") or 0) >= 2:
+                flag("redirect_chain", f"{url} redirects {facts['redirect_count']} times")
+
+        # 3. Final score and severity
+        score = min(100, sum(RISK_WEIGHTS[factor] for factor in reasons))
+        severity = next(label for bound, label in SEVERITY_BANDS if score <= bound)
+
+        if reasons:
+            explanation = f"{severity} risk ({score}/100) based on {len(reasons)} risk factor(s)."
+        else:
+            explanation = "No scam indicators were found."
+
+        return RiskAssessment(
+            risk_score=score,
+            severity_label=severity,
+            scam_type=_scam_type(score, reasons, indicators),
+            reasons=list(reasons.values()),
+            explanation=explanation,
+            # Left empty so callers fall back to their score-based recommendations
+            recommended_actions=[]
+        ).model_dump()
+
+def _upstream_errors(indicators: Dict[str, Any], link_findings: List[Dict[str, Any]]) -> List[str]:
+    errors = []
+    if indicators.get("error"):
+        errors.append(f"Extractor Error: {indicators['error']}")
+    for finding in link_findings:
+        if finding.get("error"):
+            errors.append(f"Link Analysis Error ({finding.get('url')}): {finding['error']}")
+    return errors
+
+def _root_label(host: str) -> str:
+    # Label of the registrable domain: "login.paypal.com" / "www.paypal.co.uk" -> "paypal"
+    if _EXTRACT is not None:
+        return _EXTRACT(host).domain or host
+    labels = host.split(".")
+    if len(labels) >= 3 and labels[-2] in _SECOND_LEVEL_SUFFIXES and len(labels[-1]) == 2:
+        return labels[-3]
+    return labels[-2] if len(labels) >= 2 else host
+
+def _claimed_brand(brand: str, host: str) -> str:
+    # The brand a link claims to be: the one the message impersonates, else a
+    # brand label in its hostname; None for generic words such as "bank"
+    if brand:
+        return None if _brand_token(brand) in GENERIC_BRANDS else brand
+    labels = host.replace("-", ".").split(".")
+    return next((b for b in HOST_BRANDS if b in labels), None)
+
+def _brand_token(brand: str) -> str:
+    return brand.lower().replace(" ", "")
+
+def _is_official(host: str, brand: str) -> bool:
+    # Exact match, so look-alikes such as "paypal-secure-verify.com" or "mypaypal.net" are not official
+    return _brand_token(brand) == _root_label(host)
+
+def _is_mismatched(url: str, host: str, brand: str) -> bool:
+    return _brand_token(brand) in url.lower() and not _is_official(host, brand)
+
+def _scam_type(score: int, reasons: Dict[str, str], indicators: Dict[str, Any]) -> str:
+    if score <= 20:
+        return "None"
+    actions = indicators.get("requested_actions") or []
+    if {"credential_harvest", "mismatched_domain", "brand_impersonation"} & reasons.keys():
+        return "Phishing"
+    if "download" in actions:
+        return "Malware"
+    if "payment" in actions:
+        return "Payment Scam"
+    return "Social Engineering Scam"
+
+INSTANCE = ScoringAgent()
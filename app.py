@@ -1,100 +1,390 @@
-import json
 import uuid
+import hashlib
+import orjson
 import time
 import os
 import sys
+import atexit
+import signal
 import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, deque
+from heapq import nlargest
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from flask import Flask, request, jsonify, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from dotenv import load_dotenv
+
+# Loaded once, before the agents and services below read their settings
+load_dotenv()
 
 # Ensure we can import agents
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from agents.ingestion_agent import IngestionAgent
-from agents.extractor_agent import ExtractorAgent
-from agents.link_analyzer_agent import LinkAnalyzerAgent
-from agents.scoring_agent import ScoringAgent
-from agents.report_agent import ReportAgent
+from agents.ingestion_agent import INSTANCE as ingestion
+from agents.extractor_agent import INSTANCE as extractor
+from agents.link_analyzer_agent import INSTANCE as link_analyzer
+from agents.scoring_agent import INSTANCE as scoring
+from agents.report_agent import INSTANCE as report_agent
 
 from schemas.message_artifact import MessageArtifact
 from mcp.tools.whois import whois_lookup
 from mcp.tools.fetch import fetch_url, extract_page_signals
 from services.recovery_chat import RecoveryChatService
 
+class ORJSONProvider(DefaultJSONProvider):
+    """Backs jsonify() and request.json with orjson instead of the stdlib json module"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 # Allow CORS for Next.js dev server
 CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
 
 # ============================================================================
-# In-Memory Database (with JSON persistence)
+# In-Memory Database (with JSON Lines persistence)
 # ============================================================================
 ANALYSES_DB: Dict[str, Dict[str, Any]] = {}
 EVENTS_DB: Dict[str, List[Dict[str, Any]]] = {}
-
-# Persistence files
-ANALYSES_LOG_FILE = "analyses_log.json"
-EVENTS_LOG_FILE = "events_log.json"
+# The same events pre-encoded as SSE frames; events never change once logged
+EVENT_FRAMES: Dict[str, List[bytes]] = {}
+
+# Running aggregates behind /api/stats, kept in step with ANALYSES_DB by insert_analysis
+HIGH_RISK_SCORE = 70
+
+def _empty_stats() -> Dict[str, Any]:
+    return {
+        "total": 0,
+        "high_risk": 0,
+        "sum_score": 0,
+        "categories": Counter(),
+        "top_category": ("OTHER", 0),  # (name, count), updated as categories are counted
+        "brands": {},            # name -> (count, total_score)
+        "trend": {},             # YYYY-MM-DD -> [count, highRiskCount]
+        "recent_high_risk": deque(maxlen=5)   # ids of the 5 newest high-risk analyses, oldest first
+    }
+
+STATS: Dict[str, Any] = _empty_stats()
+_STATS_LOCK = threading.Lock()
+
+# Persistence files (append-only, one JSON record per line)
+ANALYSES_LOG_FILE = "analyses_log.jsonl"
+EVENTS_LOG_FILE = "events_log.jsonl"
+# Whole-DB snapshots written by earlier versions, migrated on first load
+LEGACY_ANALYSES_FILE = "analyses_log.json"
+LEGACY_EVENTS_FILE = "events_log.json"
+# Rewrite the logs from memory after this many appended analyses
+COMPACT_EVERY = 100
+# Appends reach the OS on every write; fsync to disk at most this often (seconds),
+# plus once on exit
+FSYNC_INTERVAL = 5.0
+
+# Content hash of (source type, normalized text) -> analysis id, so resubmitted
+# messages (e.g. a forwarded campaign) reuse the earlier analysis
+CONTENT_INDEX: Dict[str, str] = {}
+# Analyses older than this are re-run, since link facts such as domain age drift
+DEDUP_MAX_AGE = timedelta(hours=int(os.getenv("DEDUP_MAX_AGE_HOURS", "24")))
+
+# Background pipeline runs (?async=1); finished analyses move to ANALYSES_DB
+PIPELINE_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("PIPELINE_WORKERS", "8")), thread_name_prefix="pipeline")
+PENDING: Dict[str, Dict[str, Any]] = {}  # analysis id -> {"id", "status", "error"}
+# Notified on every new event frame and PENDING change, so SSE clients follow runs live
+_EVENTS_COND = threading.Condition()
+# Comment frame sent when nothing happened for this long, keeping idle streams open
+SSE_KEEPALIVE_SECONDS = 15
+
+_PERSIST_LOCK = threading.Lock()
+_appends_since_compaction = 0
+_last_fsync: Dict[str, float] = {}  # log file -> monotonic time of its last fsync
+# Compaction rewrites the logs from memory, so it is only safe once they were loaded
+_data_loaded = False
+# Until the legacy snapshots are migrated, nothing is appended to the logs: an
+# existing analyses log would make the next start skip the migration for good
+_migration_pending = not os.path.exists(ANALYSES_LOG_FILE) and os.path.exists(LEGACY_ANALYSES_FILE)
+# load_data runs once per process, from __main__ or else on the first request
+_LOAD_LOCK = threading.Lock()
+_load_attempted = False
 
 # ============================================================================
 # Persistence Helpers
 # ============================================================================
 
 def load_data():
-    """Load analyses and events from JSON files on startup"""
-    global ANALYSES_DB, EVENTS_DB
-    
-    # Load analyses
+    """Load analyses and events from the JSON Lines logs on startup"""
+    global _load_attempted
+    with _LOAD_LOCK:
+        if _load_attempted:
+            return
+        _load_attempted = True
+        _load_logs()
+
+def _load_logs():
+    global ANALYSES_DB, EVENTS_DB, _data_loaded
+
+    if not os.path.exists(ANALYSES_LOG_FILE) and os.path.exists(LEGACY_ANALYSES_FILE):
+        _migrate_legacy_snapshots()
+        _rebuild_indexes()
+        return
+    _data_loaded = True
+
+    # Load analyses (the latest record per id wins)
     if os.path.exists(ANALYSES_LOG_FILE):
         try:
-            with open(ANALYSES_LOG_FILE, 'r') as f:
-                ANALYSES_DB = json.load(f)
+            with open(ANALYSES_LOG_FILE, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        record = orjson.loads(line)
+                        ANALYSES_DB[record["id"]] = record
             print(f"[Persistence] Loaded {len(ANALYSES_DB)} analyses from {ANALYSES_LOG_FILE}")
         except Exception as e:
             print(f"[Persistence] Error loading analyses: {e}")
             ANALYSES_DB = {}
-    
-    # Load events
+
+    # Load events (one event per line, in pipeline order)
     if os.path.exists(EVENTS_LOG_FILE):
         try:
-            with open(EVENTS_LOG_FILE, 'r') as f:
-                EVENTS_DB = json.load(f)
+            with open(EVENTS_LOG_FILE, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        record = orjson.loads(line)
+                        EVENTS_DB.setdefault(record["id"], []).append(record["event"])
             print(f"[Persistence] Loaded events for {len(EVENTS_DB)} analyses from {EVENTS_LOG_FILE}")
         except Exception as e:
             print(f"[Persistence] Error loading events: {e}")
             EVENTS_DB = {}
 
-def save_data():
-    """Save analyses and events to JSON files"""
+    _rebuild_indexes()
+
+def _rebuild_indexes():
+    # Everything derived from ANALYSES_DB / EVENTS_DB, after they are (re)loaded
+    _rebuild_content_index()
+    _rebuild_stats()
+    EVENT_FRAMES.clear()
+    for analysis_id, events in EVENTS_DB.items():
+        EVENT_FRAMES[analysis_id] = [_sse_frame(event).encode() for event in events]
+
+def _rebuild_content_index():
+    # Only analyses that actually ran the pipeline are indexed, mirroring run time
+    for analysis_id, analysis in ANALYSES_DB.items():
+        if analysis.get("rawContent") is not None and not analysis.get("duplicateOf") and _reusable(analysis):
+            CONTENT_INDEX[_content_key(analysis["rawContent"], analysis.get("sourceType", ""))] = analysis_id
+
+def _reusable(analysis: Dict[str, Any]) -> bool:
+    # An Unknown result means part of the pipeline failed; resubmissions re-run it
+    risk_assessment = (analysis.get("mas_artifacts") or {}).get("risk_assessment") or {}
+    return risk_assessment.get("severity_label") != "Unknown"
+
+def _migrate_legacy_snapshots():
+    """Load the old whole-file JSON snapshots and rewrite them as JSON Lines logs"""
+    global ANALYSES_DB, EVENTS_DB, _data_loaded, _migration_pending
     try:
-        # Save analyses
-        with open(ANALYSES_LOG_FILE, 'w') as f:
-            json.dump(ANALYSES_DB, f, indent=2)
-        
-        # Save events
-        with open(EVENTS_LOG_FILE, 'w') as f:
-            json.dump(EVENTS_DB, f, indent=2)
-        
-        print(f"[Persistence] Saved {len(ANALYSES_DB)} analyses to disk")
+        with open(LEGACY_ANALYSES_FILE, 'rb') as f:
+            ANALYSES_DB = orjson.loads(f.read())
+        if os.path.exists(LEGACY_EVENTS_FILE):
+            with open(LEGACY_EVENTS_FILE, 'rb') as f:
+                EVENTS_DB = orjson.loads(f.read())
+        print(f"[Persistence] Migrating {len(ANALYSES_DB)} analyses from {LEGACY_ANALYSES_FILE}")
+        _data_loaded = True
+        if compact_data():
+            _migration_pending = False
     except Exception as e:
-        print(f"[Persistence] Error saving data: {e}")
+        print(f"[Persistence] Error migrating legacy data: {e}")
+
+def insert_analysis(analysis: Dict[str, Any]):
+    """Store an analysis in ANALYSES_DB and fold it into the running stats"""
+    replaced = analysis["id"] in ANALYSES_DB
+    ANALYSES_DB[analysis["id"]] = analysis
+    if replaced:
+        # Cannot subtract the old record reliably (e.g. recentHighRisk), so start over
+        _rebuild_stats()
+    else:
+        with _STATS_LOCK:
+            _add_to_stats(analysis)
+
+def _rebuild_stats():
+    with _STATS_LOCK:
+        STATS.update(_empty_stats())
+        # Oldest first, matching the order in which new analyses are added
+        for analysis in sorted(ANALYSES_DB.values(), key=lambda a: a.get('createdAt') or ''):
+            _add_to_stats(analysis)
+
+def _add_to_stats(analysis: Dict[str, Any]):
+    threat = analysis.get('threatScore', 0)
+    is_high_risk = threat >= HIGH_RISK_SCORE
+    STATS["total"] += 1
+    STATS["sum_score"] += threat
+    if is_high_risk:
+        STATS["high_risk"] += 1
+        STATS["recent_high_risk"].append(analysis["id"])
+
+    category = analysis.get('category', 'OTHER')
+    STATS["categories"][category] += 1
+    count = STATS["categories"][category]
+    if count > STATS["top_category"][1]:
+        STATS["top_category"] = (category, count)
+
+    # createdAt is ISO-8601, so its first 10 characters are the YYYY-MM-DD key;
+    # malformed values land in a bucket that never matches the trend window
+    trend = STATS["trend"].setdefault((analysis.get('createdAt') or '')[:10], [0, 0])
+    trend[0] += 1
+    if is_high_risk:
+        trend[1] += 1
+
+    brand = analysis.get('impersonatedBrand')
+    if brand and brand != "None":
+        count, total_score = STATS["brands"].get(brand, (0, 0))
+        STATS["brands"][brand] = (count + 1, total_score + threat)
+
+def _dumps_line(record: Dict[str, Any]) -> bytes:
+    return orjson.dumps(record) + b"\n"
+
+def append_analysis(analysis: Dict[str, Any]):
+    """Append one analysis record to the log; O(1) regardless of DB size"""
+    global _appends_since_compaction
+    try:
+        with _PERSIST_LOCK:
+            _append_lines(ANALYSES_LOG_FILE, [_dumps_line(analysis)])
+            _appends_since_compaction += 1
+            should_compact = _appends_since_compaction >= COMPACT_EVERY
+        if should_compact:
+            compact_data()
+    except Exception as e:
+        print(f"[Persistence] Error saving analysis: {e}")
+
+def record_event(analysis_id: str, event: Dict[str, Any]):
+    """Add an event to EVENTS_DB, wake SSE clients and append it to the log"""
+    frame = _sse_frame(event).encode()
+    try:
+        # Held across both steps, so a compaction cannot write the event from
+        # memory in between and have the append duplicate it
+        with _PERSIST_LOCK:
+            with _EVENTS_COND:
+                EVENTS_DB[analysis_id].append(event)
+                EVENT_FRAMES[analysis_id].append(frame)
+                _EVENTS_COND.notify_all()
+            _append_lines(EVENTS_LOG_FILE, [_dumps_line({"id": analysis_id, "event": event})])
+    except Exception as e:
+        print(f"[Persistence] Error saving events: {e}")
+
+def _append_lines(path: str, lines: List[bytes]):
+    # Caller holds _PERSIST_LOCK
+    if _migration_pending:
+        print(f"[Persistence] Legacy data not migrated yet, not writing to {path}")
+        return
+    with open(path, 'ab') as f:
+        f.writelines(lines)
+        now = time.monotonic()
+        if now - _last_fsync.get(path, 0.0) >= FSYNC_INTERVAL:
+            f.flush()
+            os.fsync(f.fileno())
+            _last_fsync[path] = now
+
+def _fsync_logs():
+    with _PERSIST_LOCK:
+        for path in (ANALYSES_LOG_FILE, EVENTS_LOG_FILE):
+            if os.path.exists(path):
+                with open(path, 'ab') as f:
+                    os.fsync(f.fileno())
+
+def compact_data() -> bool:
+    """Rewrite both logs from memory, dropping superseded records; True on success"""
+    global _appends_since_compaction
+    if not _data_loaded:
+        return False
+    try:
+        with _PERSIST_LOCK:
+            with open(ANALYSES_LOG_FILE + ".tmp", 'wb') as f:
+                f.writelines(_dumps_line(analysis) for analysis in list(ANALYSES_DB.values()))
+                f.flush()
+                os.fsync(f.fileno())
+            with open(EVENTS_LOG_FILE + ".tmp", 'wb') as f:
+                for analysis_id, events in list(EVENTS_DB.items()):
+                    f.writelines(_dumps_line({"id": analysis_id, "event": event}) for event in list(events))
+                f.flush()
+                os.fsync(f.fileno())
+            # Only swapped in once the new copies are on disk
+            os.replace(ANALYSES_LOG_FILE + ".tmp", ANALYSES_LOG_FILE)
+            os.replace(EVENTS_LOG_FILE + ".tmp", EVENTS_LOG_FILE)
+            _appends_since_compaction = 0
+        print(f"[Persistence] Compacted {len(ANALYSES_DB)} analyses to disk")
+        return True
+    except Exception as e:
+        print(f"[Persistence] Error compacting data: {e}")
+        return False
+
+def _compact_on_exit():
+    # Skip processes that never wrote (e.g. the debug reloader's parent),
+    # whose in-memory copy would be stale
+    if _appends_since_compaction:
+        compact_data()
+    elif _last_fsync:
+        _fsync_logs()
+
+atexit.register(_compact_on_exit)
+
+def _exit_on_sigterm(signum, frame):
+    # Turns SIGTERM into a normal exit so the atexit compaction/fsync runs
+    sys.exit(0)
 
 
 # ============================================================================
 # Helpers
 # ============================================================================
 
-def run_pipeline(text: str, source_type: str, metadata: Dict[str, Any] = {}) -> Dict[str, Any]:
+def run_pipeline(text: str, source_type: str, metadata: Dict[str, Any] = {},
+                 analysis_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Runs the full agent pipeline synchronously (for now) 
     and returns the final analysis object.
     """
-    analysis_id = str(uuid.uuid4())
+    events = _pipeline_events(text, source_type, metadata, analysis_id)
+    while True:
+        try:
+            next(events)
+        except StopIteration as done:
+            return done.value
+
+def run_pipeline_stream(text: str, source_type: str, metadata: Dict[str, Any] = {}):
+    """
+    Runs the pipeline, yielding each event as an SSE frame as soon as it is
+    logged, then the final analysis object as a "result" event.
+    """
+    events = _pipeline_events(text, source_type, metadata)
+    try:
+        while True:
+            yield _sse_frame(next(events))
+    except StopIteration as done:
+        yield _sse_frame(done.value, event="result")
+    except Exception:
+        # The "failed" event has already been sent and persisted
+        pass
+
+def _sse_frame(data: Any, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {orjson.dumps(data).decode()}\n\n"
+
+def _pipeline_events(text: str, source_type: str, metadata: Dict[str, Any],
+                     analysis_id: Optional[str] = None):
+    """
+    Generator behind run_pipeline: yields every event as it is logged and
+    returns the final analysis object.
+    """
+    analysis_id = analysis_id or str(uuid.uuid4())
     created_at = datetime.now()
     
     # Initialize DB entry
     EVENTS_DB[analysis_id] = []
+    EVENT_FRAMES[analysis_id] = []
+    content_key = _content_key(text, source_type)
     
     def log_event(agent_name: str, action: str, details: Any):
         event = {
@@ -103,48 +393,60 @@ def run_pipeline(text: str, source_type: str, metadata: Dict[str, Any] = {}) ->
             "action": action,
             "details": details
         }
-        EVENTS_DB[analysis_id].append(event)
+        # Persisted as it happens, so a crash mid-run keeps the events so far
+        record_event(analysis_id, event)
         return event
 
+    duplicate = _recent_duplicate(content_key, created_at)
+    if duplicate:
+        yield log_event("Orchestrator", "deduplicated", {"duplicate_of": duplicate["id"]})
+        analysis_result = {
+            **duplicate,
+            "id": analysis_id,
+            "createdAt": created_at.isoformat(),
+            "updatedAt": datetime.now().isoformat(),
+            "timeline": _generate_timeline(created_at),
+            "rawContent": text,
+            "duplicateOf": duplicate["id"]
+        }
+        insert_analysis(analysis_result)
+        append_analysis(analysis_result)
+        return analysis_result
+
     try:
         # 1. Ingestion
-        log_event("IngestionAgent", "started", {"text_length": len(text)})
-        ingestion = IngestionAgent()
+        yield log_event("IngestionAgent", "started", {"text_length": len(text)})
         artifact = ingestion.process(text)
         artifact.source_type = source_type # Override if needed
         # Merge provided metadata
         if metadata:
             artifact.metadata.update(metadata)
-        log_event("IngestionAgent", "completed", artifact.model_dump())
-
-        # 2. Extraction
-        log_event("ExtractorAgent", "started", {})
-        extractor = ExtractorAgent()
-        indicators = extractor.analyze(artifact)
-        log_event("ExtractorAgent", "completed", indicators)
-
-        # 3. Link Analysis
-        log_event("LinkAnalyzerAgent", "started", {"url_count": len(artifact.extracted_entities.urls)})
-        link_analyzer = LinkAnalyzerAgent()
-        link_findings = link_analyzer.analyze(artifact.extracted_entities.urls)
-        log_event("LinkAnalyzerAgent", "completed", link_findings)
+        # Serialized once and shared by the event log, the agents and mas_artifacts
+        artifact_dump = artifact.model_dump()
+        artifact_json = orjson.dumps(artifact_dump).decode()
+        yield log_event("IngestionAgent", "completed", artifact_dump)
+
+        # 2. Extraction + 3. Link Analysis (independent, run concurrently)
+        yield log_event("ExtractorAgent", "started", {})
+        yield log_event("LinkAnalyzerAgent", "started", {"url_count": len(artifact.extracted_entities.urls)})
+        indicators, link_findings = asyncio.run(_extract_and_analyze_links(artifact, artifact_json))
+        yield log_event("ExtractorAgent", "completed", indicators)
+        yield log_event("LinkAnalyzerAgent", "completed", link_findings)
 
         # 4. Scoring
-        log_event("ScoringAgent", "started", {})
-        scoring = ScoringAgent()
+        yield log_event("ScoringAgent", "started", {})
         risk_assessment = scoring.calculate_score(indicators, link_findings)
-        log_event("ScoringAgent", "completed", risk_assessment)
+        yield log_event("ScoringAgent", "completed", risk_assessment)
 
         # 5. Reporting
-        log_event("ReportAgent", "started", {})
-        report_agent = ReportAgent()
+        yield log_event("ReportAgent", "started", {})
         report_text = report_agent.generate_report(
-            artifact.model_dump(), 
+            artifact_dump,
             risk_assessment, 
             link_findings, 
             indicators
         )
-        log_event("ReportAgent", "completed", {"summary_length": len(report_text)})
+        yield log_event("ReportAgent", "completed", {"summary_length": len(report_text)})
 
         # Construct Final Analysis Object matched to UI contracts
         analysis_result = {
@@ -183,22 +485,79 @@ def run_pipeline(text: str, source_type: str, metadata: Dict[str, Any] = {}) ->
             
             # MAS artifacts (for debugging)
             "mas_artifacts": {
-                "message_artifact": artifact.model_dump(),
+                "message_artifact": artifact_dump,
                 "indicators": indicators,
                 "link_findings": link_findings,
                 "risk_assessment": risk_assessment
             }
         }
         
-        ANALYSES_DB[analysis_id] = analysis_result
-        save_data()  # Persist to disk
+        insert_analysis(analysis_result)
+        if _reusable(analysis_result):
+            CONTENT_INDEX[content_key] = analysis_id
+        # Persist to disk
+        append_analysis(analysis_result)
         return analysis_result
 
     except Exception as e:
         # Log failure
-        log_event("Orchestrator", "failed", {"error": str(e)})
+        yield log_event("Orchestrator", "failed", {"error": str(e)})
         raise e
 
+def _content_key(text: str, source_type: str) -> str:
+    normalized = " ".join(text.lower().split())
+    return hashlib.blake2b(f"{source_type}\n{normalized}".encode(), digest_size=16).hexdigest()
+
+def _recent_duplicate(content_key: str, now: datetime) -> Optional[Dict[str, Any]]:
+    # Returns the earlier analysis of the same content, if recent enough to reuse
+    analysis = ANALYSES_DB.get(CONTENT_INDEX.get(content_key))
+    if not analysis:
+        return None
+    try:
+        if now - datetime.fromisoformat(analysis["createdAt"]) > DEDUP_MAX_AGE:
+            return None
+    except (KeyError, ValueError):
+        return None
+    return analysis
+
+def enqueue_pipeline(text: str, source_type: str, metadata: Dict[str, Any] = {}) -> str:
+    """
+    Queues a pipeline run on the background pool and returns its analysis id
+    right away; progress is visible through GET /api/analyses/<id>.
+    """
+    analysis_id = str(uuid.uuid4())
+    _set_pending(analysis_id, {"id": analysis_id, "status": "queued"})
+    PIPELINE_POOL.submit(_run_queued, analysis_id, text, source_type, metadata)
+    return analysis_id
+
+def _run_queued(analysis_id: str, text: str, source_type: str, metadata: Dict[str, Any]):
+    _set_pending(analysis_id, {"id": analysis_id, "status": "processing"})
+    try:
+        run_pipeline(text, source_type, metadata, analysis_id=analysis_id)
+        _set_pending(analysis_id, None)
+    except Exception as e:
+        _set_pending(analysis_id, {"id": analysis_id, "status": "failed", "error": str(e)})
+
+def _set_pending(analysis_id: str, entry: Optional[Dict[str, Any]]):
+    # None drops the entry once the analysis is in ANALYSES_DB
+    with _EVENTS_COND:
+        if entry is None:
+            PENDING.pop(analysis_id, None)
+        else:
+            PENDING[analysis_id] = entry
+        _EVENTS_COND.notify_all()
+
+def _is_running(analysis_id: str) -> bool:
+    return PENDING.get(analysis_id, {}).get("status") in ("queued", "processing")
+
+async def _extract_and_analyze_links(artifact: MessageArtifact, artifact_json: str):
+    # Extractor only needs the artifact and LinkAnalyzer only needs its URLs,
+    # so the two LLM round-trips overlap instead of adding up.
+    return await asyncio.gather(
+        asyncio.to_thread(extractor.analyze, artifact_json),
+        link_analyzer.analyze(artifact.extracted_entities.urls)
+    )
+
 def _map_threat_type(scam_type: str) -> str:
     # Maps backend scam types to UI ThreatType enum
     scam_type_upper = scam_type.upper()
@@ -215,7 +574,14 @@ def _generate_recommendations(risk_assessment: Dict) -> List[Dict]:
     score = risk_assessment.get("risk_score", 0)
     actions = []
     
-    if score > 70:
+    if risk_assessment.get("severity_label") == "Unknown":
+        # Part of the analysis failed, so a low score says nothing about safety
+        actions.append({
+            "title": "Treat this message with caution",
+            "priority": "med",
+            "detail": "The analysis could not be completed. Do not click links until it can be re-run."
+        })
+    elif score > 70:
         actions.append({
             "title": "Do not click any links",
             "priority": "high",
@@ -267,12 +633,30 @@ def _generate_timeline(start_time: datetime) -> List[Dict]:
 # Routes
 # ============================================================================
 
+def _wants_stream() -> bool:
+    # ?stream=1 streams pipeline events as SSE instead of waiting for the JSON result
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+def _wants_async() -> bool:
+    # ?async=1 queues the pipeline and answers 202 with the analysis id
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+def _stream_pipeline(text: str, source_type: str, metadata: Dict[str, Any] = {}) -> Response:
+    response = Response(stream_with_context(run_pipeline_stream(text, source_type, metadata)), mimetype='text/event-stream')
+    response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
+    response.headers.add('Access-Control-Allow-Credentials', 'true')
+    return response
+
 @app.route('/api/analyze/email', methods=['POST'])
 def analyze_email():
     data = request.json
     text = data.get('text', '')
     if not text:
         return jsonify({"error": "No text provided"}), 400
+    if _wants_stream():
+        return _stream_pipeline(text, 'email', data.get('metadata', {}))
+    if _wants_async():
+        return jsonify({"id": enqueue_pipeline(text, 'email', data.get('metadata', {})), "status": "queued"}), 202
         
     try:
         result = run_pipeline(text, 'email', data.get('metadata', {}))
@@ -294,6 +678,10 @@ def analyze_url():
     
     # We will simulate the URL analysis by passing it as text context
     text_representation = f"URL to analyze: {url}"
+    if _wants_stream():
+        return _stream_pipeline(text_representation, 'url', data.get('metadata', {}))
+    if _wants_async():
+        return jsonify({"id": enqueue_pipeline(text_representation, 'url', data.get('metadata', {})), "status": "queued"}), 202
     
     try:
         result = run_pipeline(text_representation, 'url', data.get('metadata', {}))
@@ -312,6 +700,10 @@ def analyze_file():
     # Simple text read for now
     try:
         content = file.read().decode('utf-8', errors='ignore')
+        if _wants_stream():
+            return _stream_pipeline(content, 'file')
+        if _wants_async():
+            return jsonify({"id": enqueue_pipeline(content, 'file'), "status": "queued"}), 202
         result = run_pipeline(content, 'file')
         return jsonify(result)
     except Exception as e:
@@ -335,53 +727,35 @@ def list_analyses():
 def get_analysis(id):
     item = ANALYSES_DB.get(id)
     if not item:
+        pending = PENDING.get(id)
+        if pending:
+            # Queued, processing or failed background run
+            return jsonify(pending)
         return jsonify({"error": "Not found"}), 404
     return jsonify(item)
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    total = len(ANALYSES_DB)
-    items = list(ANALYSES_DB.values())
-    
-    # 1. High Risk Count
-    high_risk = len([i for i in items if i.get('threatScore', 0) >= 70])
-    
-    # 2. Avg Score
-    avg_score = sum(i.get('threatScore', 0) for i in items) / total if total > 0 else 0
-    
-    # 3. Top Category
-    categories = {}
-    for i in items:
-        cat = i.get('category', 'OTHER')
-        categories[cat] = categories.get(cat, 0) + 1
-    top_category = max(categories, key=categories.get) if categories else "OTHER"
-    
-    # 4. Trend Data (Last 7 Days)
-    # Group by YYYY-MM-DD
-    trend_map = {} # date -> {count: 0, highRiskCount: 0}
     now = datetime.now()
-    # Initialize last 7 days with 0
-    for i in range(6, -1, -1):
-        date_str = (now - timedelta(days=i)).strftime('%Y-%m-%d')
-        trend_map[date_str] = {"count": 0, "highRiskCount": 0}
-        
-    for i in items:
-        try:
-            dt = datetime.fromisoformat(i['createdAt'])
-            date_key = dt.strftime('%Y-%m-%d')
-            if date_key in trend_map:
-                trend_map[date_key]["count"] += 1
-                if i.get('threatScore', 0) >= 70:
-                    trend_map[date_key]["highRiskCount"] += 1
-        except:
-            pass
-            
-    trend_data = [
-        {"date": k, "count": v["count"], "highRiskCount": v["highRiskCount"]} 
-        for k, v in trend_map.items()
-    ]
-    
-    # 5. Category Breakdown for Chart
+
+    with _STATS_LOCK:
+        total = STATS["total"]
+        high_risk = STATS["high_risk"]
+        sum_score = STATS["sum_score"]
+        categories = STATS["categories"].copy()
+        top_category = STATS["top_category"][0]
+        brands = dict(STATS["brands"])
+        # Trend Data (Last 7 Days), grouped by YYYY-MM-DD
+        trend_data = []
+        for i in range(6, -1, -1):
+            date_str = (now - timedelta(days=i)).strftime('%Y-%m-%d')
+            count, high_risk_count = STATS["trend"].get(date_str, (0, 0))
+            trend_data.append({"date": date_str, "count": count, "highRiskCount": high_risk_count})
+        recent_ids = list(reversed(STATS["recent_high_risk"]))  # newest first
+
+    avg_score = sum_score / total if total > 0 else 0
+
+    # Category Breakdown for Chart
     # Interface: { category: string, count: number, percentage: number }
     category_breakdown = []
     for cat, count in categories.items():
@@ -391,25 +765,15 @@ def get_stats():
             "percentage": (count / total * 100) if total > 0 else 0
         })
     
-    # 6. Top Impersonated Brands
+    # Top Impersonated Brands
     # Interface: { name: string, count: number, avgThreatScore: number }
-    brands_stats = {} # name -> {count: 0, total_score: 0}
-    for i in items:
-        brand = i.get('impersonatedBrand')
-        if brand and brand != "None":
-            if brand not in brands_stats:
-                brands_stats[brand] = {"count": 0, "total_score": 0}
-            brands_stats[brand]["count"] += 1
-            brands_stats[brand]["total_score"] += i.get('threatScore', 0)
-            
     top_brands = []
     # Sort by count desc
-    sorted_brands = sorted(brands_stats.items(), key=lambda item: item[1]['count'], reverse=True)[:5]
-    for name, stats in sorted_brands:
+    for name, (count, total_score) in nlargest(5, brands.items(), key=lambda item: item[1][0]):
         top_brands.append({
             "name": name,
-            "count": stats["count"],
-            "avgThreatScore": stats["total_score"] / stats["count"]
+            "count": count,
+            "avgThreatScore": total_score / count
         })
     
     return jsonify({
@@ -420,7 +784,7 @@ def get_stats():
         "trendData": trend_data,
         "categoryBreakdown": category_breakdown,
         "topBrands": top_brands,
-        "recentHighRisk": [i for i in items if i.get('threatScore', 0) >= 70][:5],
+        "recentHighRisk": [ANALYSES_DB[analysis_id] for analysis_id in recent_ids if analysis_id in ANALYSES_DB],
         "startDate": (now - timedelta(days=7)).isoformat(),
         "endDate": now.isoformat()
     })
@@ -429,19 +793,27 @@ def get_stats():
 def get_analysis_events(id):
     # SSE Endpoint
     def generate():
-        # First send existing events
-        existing = EVENTS_DB.get(id, [])
-        for evt in existing:
-            yield f"data: {json.dumps(evt)}\n\n"
-        
-        # If the analysis is already done, we just end?
-        # In a real async system, we'd subscribe to a pub/sub.
-        # Here analysis is synchronous, so by the time we call this,
-        # all events are likely already in DB. 
-        # So we just send them and close.
-        pass
-
-    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+        # Send the events logged so far, then follow a queued/processing run
+        # until it finishes; finished analyses just replay and close.
+        sent = 0
+        while True:
+            with _EVENTS_COND:
+                if len(EVENT_FRAMES.get(id, ())) <= sent and _is_running(id):
+                    _EVENTS_COND.wait(timeout=SSE_KEEPALIVE_SECONDS)
+                # Checked before reading the frames: once a run is no longer
+                # running, all of its events have been logged
+                running = _is_running(id)
+                frames = EVENT_FRAMES.get(id, [])[sent:]
+            if frames:
+                sent += len(frames)
+                yield from frames
+            elif running:
+                yield b": keepalive\n\n"
+            if not running:
+                return
+
+    # Frames are already bytes, so Werkzeug can pass them through as-is
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', direct_passthrough=True)
     response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     return response
@@ -467,7 +839,7 @@ def handle_whois():
     if not domain:
         return jsonify({"error": "domain is required"}), 400
     try:
-        result = whois_lookup(domain)
+        result = whois_lookup(domain, verbose=bool(data.get('verbose')))
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -492,7 +864,7 @@ def handle_signals():
     if not url:
         return jsonify({"error": "url is required"}), 400
     try:
-        result = extract_page_signals(url, html_content)
+        result = extract_page_signals(url, html_content, deep=bool(data.get('deep')))
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -537,6 +909,13 @@ def message_recovery_chat():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.before_request
+def _load_on_first_request():
+    # flask run / gunicorn import the app without running __main__
+    if not _load_attempted:
+        load_data()
+
 if __name__ == '__main__':
     load_data()  # Load existing analyses from disk
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
     app.run(debug=True, port=5000)
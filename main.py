@@ -1,19 +1,21 @@
 import asyncio
 import sys
 import os
-from agents.ingestion_agent import IngestionAgent
-from agents.extractor_agent import ExtractorAgent
-from agents.link_analyzer_agent import LinkAnalyzerAgent
-from agents.scoring_agent import ScoringAgent
-from agents.report_agent import ReportAgent
 from dotenv import load_dotenv
-import json
+
+# Loaded once, before the agents read their settings
+load_dotenv()
+
+from agents.ingestion_agent import INSTANCE as ingestion
+from agents.extractor_agent import INSTANCE as extractor
+from agents.link_analyzer_agent import INSTANCE as link_analyzer
+from agents.scoring_agent import INSTANCE as scoring
+from agents.report_agent import INSTANCE as report_agent
+import orjson
 
 # Ensure we can import modules from current directory
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-load_dotenv()
-
 def main():
     print("---------------------------------------------------------")
     print("   Silent Cyber Threats - Scam Analyzer (Agentic AI)   ")
@@ -44,29 +46,25 @@ def main():
         return
 
     print("\n[1/5] 📥 Ingesting message...")
-    ingestion = IngestionAgent()
     artifact = ingestion.process(raw_input)
     print(f"      Parsed: {artifact.subject} (Sender: {artifact.sender.display_name})")
+    artifact_dump = artifact.model_dump()
 
     print("\n[2/5] 🕵️  Extracting indicators...")
-    extractor = ExtractorAgent()
-    indicators = extractor.analyze(artifact)
+    indicators = extractor.analyze(orjson.dumps(artifact_dump).decode())
     print(f"      Urgency: {indicators.get('urgency_detected')}, Brand: {indicators.get('brand_impersonation', {}).get('brand_name')}")
 
     print("\n[3/5] 🔗 Analyzing links (via MCP)...")
-    link_analyzer = LinkAnalyzerAgent()
-    link_findings = link_analyzer.analyze(artifact.extracted_entities.urls)
+    link_findings = asyncio.run(link_analyzer.analyze(artifact.extracted_entities.urls))
     print(f"      Analyzed {len(link_findings)} links.")
 
     print("\n[4/5] ⚖️  Scoring risk...")
-    scoring = ScoringAgent()
     risk_assessment = scoring.calculate_score(indicators, link_findings)
     print(f"      Score: {risk_assessment.get('risk_score')}/100 ({risk_assessment.get('severity_label')})")
 
     print("\n[5/5] 📝 Generating report...")
-    report_agent = ReportAgent()
     report = report_agent.generate_report(
-        artifact.model_dump(), 
+        artifact_dump,
         risk_assessment, 
         link_findings, 
         indicators
@@ -78,7 +76,7 @@ def main():
 
     # --- JSON Trace Generation (Fix #2) ---
     analysis_trace = {
-        "IngestionAgent": json.loads(artifact.model_dump_json()),
+        "IngestionAgent": artifact_dump,
         "ExtractorAgent": indicators,
         "LinkAnalyzerAgent": link_findings,
         "ScoringAgent": risk_assessment,
@@ -87,8 +85,8 @@ def main():
         }
     }
     
-    with open("analysis_trace.json", "w") as f:
-        json.dump(analysis_trace, f, indent=2)
+    with open("analysis_trace.json", "wb") as f:
+        f.write(orjson.dumps(analysis_trace, option=orjson.OPT_INDENT_2))
     print("\n[Trace] analysis_trace.json saved.")
 
 if __name__ == "__main__":
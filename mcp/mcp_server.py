@@ -17,7 +17,7 @@ def handle_whois():
     domain = data.get('domain')
     if not domain:
         return jsonify({"error": "domain is required"}), 400
-    result = whois_lookup(domain)
+    result = whois_lookup(domain, verbose=bool(data.get('verbose')))
     return jsonify(result)
 
 @app.route('/mcp/fetch', methods=['POST'])
@@ -36,7 +36,7 @@ def handle_signals():
     html_content = data.get('html_content') # Optional, can be passed if already fetched
     if not url:
         return jsonify({"error": "url is required"}), 400
-    result = extract_page_signals(url, html_content)
+    result = extract_page_signals(url, html_content, deep=bool(data.get('deep')))
     return jsonify(result)
 
 @app.route('/mcp/dns', methods=['POST'])
@@ -1,18 +1,43 @@
+import threading
 import dns.resolver
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache, cached
 from typing import List, Dict, Any
 
+RECORD_TYPES = ('A', 'MX', 'NS', 'TXT')
+
+# Answers per (normalized domain, record type); lookup failures are not cached
+_CACHE = TTLCache(maxsize=4096, ttl=3600)
+
+# Built once instead of per query; lifetime caps each lookup, retries included
+_RES = dns.resolver.Resolver()
+_RES.lifetime = 3.0
+
+# The record types of a domain are looked up in parallel (four domains at a time)
+_POOL = ThreadPoolExecutor(max_workers=4 * len(RECORD_TYPES), thread_name_prefix="dns")
+
 def get_dns_records(domain: str) -> Dict[str, Any]:
     """
     Retrieves basic DNS records for a domain.
     """
+    domain = domain.strip().lower().rstrip('.')
     records = {}
     try:
-        for rtype in ['A', 'MX', 'NS', 'TXT']:
+        futures = {rtype: _POOL.submit(_resolve, domain, rtype) for rtype in RECORD_TYPES}
+        for rtype, future in futures.items():
             try:
-                answers = dns.resolver.resolve(domain, rtype)
-                records[rtype] = [str(r) for r in answers]
+                records[rtype] = list(future.result())
             except Exception:
                 records[rtype] = []
         return records
     except Exception as e:
         return {"error": str(e)}
+
+@cached(_CACHE, lock=threading.Lock())
+def _resolve(domain: str, rtype: str) -> List[str]:
+    try:
+        answers = _RES.resolve(domain, rtype)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        # A definite "no records" answer is worth caching, unlike a timeout
+        return []
+    return [str(r) for r in answers]
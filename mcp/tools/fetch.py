@@ -1,8 +1,38 @@
 import httpx
+import atexit
 from bs4 import BeautifulSoup
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 import re
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# libxml2-backed parser when lxml is installed, the pure-Python stdlib one otherwise
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Shared by every fetch so TCP/TLS handshakes are amortized over keep-alive
+# (and multiplexed HTTP/2) connections; httpx.Client is thread-safe
+_CLIENT = httpx.Client(
+    http2=True,
+    follow_redirects=True,
+    timeout=10.0,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=32, keepalive_expiry=30)
+)
+atexit.register(_CLIENT.close)
+
+# Bytes of (decompressed) body read per page; the rest is never downloaded
+MAX_BODY_BYTES = 16384
+MAX_HTML_CHARS = 10000
+
+# Response headers worth reporting; the rest would only be copied and re-serialized
+KEPT_HEADERS = ('content-type', 'server', 'location', 'content-security-policy', 'strict-transport-security')
+
 def fetch_url(url: str) -> Dict[str, Any]:
     """
     Fetches the URL and returns details.
@@ -13,11 +43,19 @@ def fetch_url(url: str) -> Dict[str, Any]:
         HTML content (truncated)
     """
     try:
-        with httpx.Client(follow_redirects=True, timeout=10.0) as client:
-            response = client.get(url)
-            
+        with _CLIENT.stream("GET", url) as response:
+            # Stop reading once enough of the body is in, instead of buffering all of it
+            chunks = []
+            total = 0
+            for chunk in response.iter_bytes(chunk_size=4096):
+                chunks.append(chunk)
+                total += len(chunk)
+                if total >= MAX_BODY_BYTES:
+                    break
+            raw = b"".join(chunks)[:MAX_BODY_BYTES]
+
             # Truncate HTML to avoid token limits
-            html_content = response.text[:10000] 
+            html_content = raw.decode(response.encoding or "utf-8", errors="ignore")[:MAX_HTML_CHARS]
             
             redirect_chain = [str(r.url) for r in response.history]
             
@@ -25,7 +63,7 @@ def fetch_url(url: str) -> Dict[str, Any]:
                 "final_url": str(response.url),
                 "redirect_chain": redirect_chain,
                 "status_code": response.status_code,
-                "headers": dict(response.headers),
+                "headers": {k: response.headers[k] for k in KEPT_HEADERS if k in response.headers},
                 "html_content": html_content
             }
     except Exception as e:
@@ -34,9 +72,38 @@ def fetch_url(url: str) -> Dict[str, Any]:
             "error": str(e)
         }
 
-def extract_page_signals(url: str, html_content: str = None) -> Dict[str, Any]:
+# Brand names looked for in page text
+_COMMON_BRANDS = ('paypal', 'google', 'microsoft', 'apple', 'facebook', 'instagram', 'netflix', 'amazon', 'bank', 'chase', 'wells fargo')
+
+# Regex fast path: membership checks on the raw markup, no tree build
+_COMMENT_RE = re.compile(r'<!--.*?(?:-->|$)', re.S)
+# Blocks whose contents are code or inert markup rather than page text
+_HIDDEN_RE = re.compile(r'<(script|style|template)\b.*?(?:</\1\s*>|$)', re.I | re.S)
+_FORM_RE = re.compile(r'<form\b.*?(?:</form\s*>|$)', re.I | re.S)
+_PW_RE = re.compile(r'<input\b[^>]*\btype\s*=\s*["\']?password\b', re.I)
+_TAG_RE = re.compile(r'<[^>]*>')
+_LOGIN_RE = re.compile(r'login|sign in', re.I)
+_BRAND_RE = re.compile('|'.join(re.escape(brand) for brand in _COMMON_BRANDS), re.I)
+
+# Deep path: one Aho-Corasick pass over the page text finds every brand;
+# without pyahocorasick it falls back to one substring scan per brand
+_BRAND_AC = None
+if ahocorasick is not None:
+    _BRAND_AC = ahocorasick.Automaton()
+    for _brand in _COMMON_BRANDS:
+        _BRAND_AC.add_word(_brand, _brand)
+    _BRAND_AC.make_automaton()
+
+def extract_page_signals(url: str, html_content: str = None, deep: bool = False) -> Dict[str, Any]:
     """
     Analyzes the page content for suspicious signals.
+    Scans the raw HTML with regexes; deep=True parses it with BeautifulSoup instead.
+    Both ignore HTML comments and <script>, <style> and <template> contents.
+    Unlike the deep path, the regex scan:
+        does not decode entities, so "&#80;ayPal" is not a brand match
+        matches type=password case-insensitively
+        treats an unclosed <form> as running to the end of the page
+        checks every form for login wording, not just the first MAX_SCANNED_FORMS
     Returns:
         Login form detected (bool)
         Password field detected (bool)
@@ -50,31 +117,15 @@ def extract_page_signals(url: str, html_content: str = None) -> Dict[str, Any]:
             return {"error": fetch_result["error"]}
         html_content = fetch_result.get("html_content", "")
 
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Login form detection
-    login_form = False
-    password_field = False
-    
-    forms = soup.find_all('form')
-    for form in forms:
-        if form.find('input', {'type': 'password'}):
-            password_field = True
-            login_form = True # Strong signal
-            break
-        
-        # Check for keywords in form action or inputs
-        text = form.get_text().lower()
-        if 'login' in text or 'sign in' in text:
-            login_form = True
-
-    # Brand keywords (simple check)
-    brand_keywords = []
-    common_brands = ['paypal', 'google', 'microsoft', 'apple', 'facebook', 'instagram', 'netflix', 'amazon', 'bank', 'chase', 'wells fargo']
-    text_content = soup.get_text().lower()
-    for brand in common_brands:
-        if brand in text_content:
-            brand_keywords.append(brand)
+    if deep:
+        login_form, password_field, has_forms, text_content = _parse_forms(html_content)
+        brand_keywords = _find_brands(text_content)
+    else:
+        # Comments and script/style/template bodies are not page text, as for the parser
+        html_content = _HIDDEN_RE.sub('', _COMMENT_RE.sub('', html_content))
+        login_form, password_field, has_forms = _scan_forms(html_content)
+        found = {match.lower() for match in _BRAND_RE.findall(_TAG_RE.sub('', html_content))}
+        brand_keywords = [brand for brand in _COMMON_BRANDS if brand in found]
 
     # Suspicious patterns
     suspicious_patterns = []
@@ -84,7 +135,7 @@ def extract_page_signals(url: str, html_content: str = None) -> Dict[str, Any]:
         suspicious_patterns.append("url_has_at_symbol")
 
     analysis_note = ""
-    if not forms:
+    if not has_forms:
         analysis_note = "No HTML forms detected on page"
         
     return {
@@ -94,3 +145,49 @@ def extract_page_signals(url: str, html_content: str = None) -> Dict[str, Any]:
         "suspicious_patterns": suspicious_patterns,
         "analysis_note": analysis_note
     }
+
+def _find_brands(text_content: str) -> List[str]:
+    # Brands in lowercased page text, in _COMMON_BRANDS order
+    if _BRAND_AC is None:
+        return [brand for brand in _COMMON_BRANDS if brand in text_content]
+    found = {brand for _, brand in _BRAND_AC.iter(text_content)}
+    return [brand for brand in _COMMON_BRANDS if brand in found]
+
+def _scan_forms(html_content: str) -> Tuple[bool, bool, bool]:
+    # (login form, password field, any form) from the raw markup
+    login_form = False
+    forms = _FORM_RE.findall(html_content)
+    for form in forms:
+        if _PW_RE.search(form):
+            return True, True, True # Strong signal
+        # Check for keywords in the form's text
+        if _LOGIN_RE.search(_TAG_RE.sub('', form)):
+            login_form = True
+    return login_form, False, bool(forms)
+
+# Forms whose text is checked for login wording on the deep path
+MAX_SCANNED_FORMS = 8
+
+def _parse_forms(html_content: str) -> Tuple[bool, bool, bool, str]:
+    # (login form, password field, any form, lowercased page text) from a full parse
+    soup = BeautifulSoup(html_content, HTML_PARSER)
+    
+    # Login form detection
+    login_form = False
+    password_field = False
+    
+    # A password input inside any form settles it without walking each form's text
+    if any(field.find_parent('form') for field in soup.find_all('input', {'type': 'password'})):
+        password_field = True
+        login_form = True # Strong signal
+
+    forms = soup.find_all('form', limit=MAX_SCANNED_FORMS)
+    if not password_field:
+        for form in forms:
+            # Check for keywords in form action or inputs
+            text = form.get_text().lower()
+            if 'login' in text or 'sign in' in text:
+                login_form = True
+                break
+
+    return login_form, password_field, bool(forms), soup.get_text().lower()
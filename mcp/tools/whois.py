@@ -1,8 +1,16 @@
 import whois
 import datetime
+import threading
+from cachetools import TTLCache, cached
 from typing import Dict, Any
 
-def whois_lookup(domain: str) -> Dict[str, Any]:
+# Successful lookups per normalized domain; failures are retried on the next call
+_CACHE = TTLCache(maxsize=4096, ttl=3600)
+
+# Phrases in the WHOIS text that indicate a privacy/proxy registration
+_PRIVACY_KEYWORDS = ('privacy', 'redacted', 'protected', 'proxy', 'guard')
+
+def whois_lookup(domain: str, verbose: bool = False) -> Dict[str, Any]:
     """
     Performs a WHOIS lookup for the given domain.
     Returns:
@@ -10,39 +18,49 @@ def whois_lookup(domain: str) -> Dict[str, Any]:
         Age in days
         Registrar
         Privacy protection flag
+        Raw WHOIS text (only when verbose)
     """
+    domain = domain.strip().lower().rstrip('.')
     try:
-        w = whois.whois(domain)
-        
-        creation_date = w.creation_date
-        if isinstance(creation_date, list):
-            creation_date = creation_date[0]
-            
-        age_days = -1
-        if creation_date:
-            if creation_date.tzinfo is None:
-                creation_date = creation_date.replace(tzinfo=datetime.timezone.utc)
-            else:
-                creation_date = creation_date.astimezone(datetime.timezone.utc)
-            
-            now = datetime.datetime.now(datetime.timezone.utc)
-            age_days = (now - creation_date).days
-            
-        privacy_found = False
-        if w.text:
-            privacy_keywords = ['privacy', 'redacted', 'protected', 'proxy', 'guard']
-            privacy_found = any(keyword in w.text.lower() for keyword in privacy_keywords)
-
-        return {
-            "domain": domain,
-            "creation_date": str(creation_date) if creation_date else None,
-            "age_days": age_days,
-            "registrar": w.registrar,
-            "privacy_protection": privacy_found,
-            "raw_whois": str(w) # minimal raw info
-        }
+        # Copied so callers never mutate the cached entry
+        return dict(_lookup(domain, verbose))
     except Exception as e:
         return {
             "domain": domain,
             "error": str(e)
         }
+
+@cached(_CACHE, lock=threading.Lock())
+def _lookup(domain: str, verbose: bool) -> Dict[str, Any]:
+    w = whois.whois(domain)
+    
+    creation_date = w.creation_date
+    if isinstance(creation_date, list):
+        creation_date = creation_date[0]
+        
+    age_days = -1
+    if creation_date:
+        if creation_date.tzinfo is None:
+            creation_date = creation_date.replace(tzinfo=datetime.timezone.utc)
+        else:
+            creation_date = creation_date.astimezone(datetime.timezone.utc)
+        
+        now = datetime.datetime.now(datetime.timezone.utc)
+        age_days = (now - creation_date).days
+        
+    privacy_found = False
+    if w.text:
+        text_lower = w.text.lower()
+        privacy_found = any(keyword in text_lower for keyword in _PRIVACY_KEYWORDS)
+
+    result = {
+        "domain": domain,
+        "creation_date": str(creation_date) if creation_date else None,
+        "age_days": age_days,
+        "registrar": w.registrar,
+        "privacy_protection": privacy_found
+    }
+    if verbose:
+        # The full parsed record runs to tens of KB, so it is opt-in
+        result["raw_whois"] = str(w)
+    return result
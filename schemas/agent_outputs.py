@@ -0,0 +1,55 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+# Used as Gemini `response_schema`s: fields carry no defaults, since
+# the SDK's schema conversion does not accept them.
+
+class BrandImpersonation(BaseModel):
+    detected: bool
+    brand_name: Optional[str]
+    evidence: Optional[str]
+
+class SenderMismatch(BaseModel):
+    detected: bool
+    explanation: Optional[str]
+
+class ExtractorOutput(BaseModel):
+    urgency_detected: bool
+    urgency_type: str
+    requested_actions: List[str]
+    brand_impersonation: BrandImpersonation
+    sender_mismatch: SenderMismatch
+    language_tone: str
+
+class LinkFacts(BaseModel):
+    domain_age_days: Optional[int]
+    registrar: Optional[str]
+    privacy_protection: Optional[bool]
+    redirect_chain: List[str]
+    redirect_count: int
+    login_form_detected: bool
+    password_field_detected: bool
+    brand_keywords_found: List[str]
+    reachability: str
+    technical_errors: List[str]
+
+class LinkFinding(BaseModel):
+    agent: str
+    url: str
+    facts: LinkFacts
+
+class LinkBatch(BaseModel):
+    results: List[LinkFinding]
+
+class RecommendedAction(BaseModel):
+    title: str
+    priority: str
+    detail: str
+
+class RiskAssessment(BaseModel):
+    risk_score: int
+    severity_label: str
+    scam_type: str
+    reasons: List[str]
+    explanation: str
+    recommended_actions: List[RecommendedAction]
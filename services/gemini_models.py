@@ -0,0 +1,85 @@
+import os
+import time
+import datetime
+import threading
+import google.generativeai as genai
+from google.generativeai import caching
+from typing import Dict, Tuple
+
+# How long a static prompt prefix stays in Gemini's context cache
+CACHE_TTL = datetime.timedelta(hours=1)
+# Recreate the cache slightly before the server-side TTL runs out
+CACHE_REFRESH_MARGIN = 60
+
+# Smallest prefix (in tokens) Gemini accepts for an explicit context cache
+MIN_CACHE_TOKENS = {"gemini-2.5-flash": 1024, "gemini-2.5-pro": 4096}
+DEFAULT_MIN_CACHE_TOKENS = 4096
+# Rough English average, to size a prefix without a count_tokens round-trip
+CHARS_PER_TOKEN = 4
+
+# (model_name, system_instruction) -> (model, refresh_at)
+_MODELS: Dict[Tuple[str, str], Tuple[genai.GenerativeModel, float]] = {}
+# One lock per key, so creating one cache never blocks callers of another model
+_KEY_LOCKS: Dict[Tuple[str, str], threading.Lock] = {}
+_LOCK = threading.Lock()
+_CONFIGURED = False
+
+def configure():
+    """
+    Configures the Gemini SDK from GEMINI_API_KEY once per process.
+    The entry point is expected to have loaded .env before the first call.
+    """
+    global _CONFIGURED
+    with _LOCK:
+        if not _CONFIGURED:
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+            _CONFIGURED = True
+
+def get_model(model_name: str, system_instruction: str) -> genai.GenerativeModel:
+    """
+    Returns a model whose static system instruction lives in Gemini's context cache,
+    so each call only sends the dynamic part of the prompt. Instructions below the
+    model's minimum cacheable size are sent as a plain system instruction instead.
+    The same model (and cache) is shared by every caller using the same prefix.
+    """
+    configure()
+    key = (model_name, system_instruction)
+    entry = _MODELS.get(key)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+
+    with _LOCK:
+        key_lock = _KEY_LOCKS.setdefault(key, threading.Lock())
+    with key_lock:
+        # Another thread may have created it while this one waited
+        entry = _MODELS.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+
+        if not _is_cacheable(model_name, system_instruction):
+            # Never worth a create call; the plain model is kept for good
+            model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+            refresh_at = float("inf")
+        else:
+            model = _create_model(model_name, system_instruction)
+            refresh_at = time.monotonic() + CACHE_TTL.total_seconds() - CACHE_REFRESH_MARGIN
+        _MODELS[key] = (model, refresh_at)
+        return model
+
+def _is_cacheable(model_name: str, system_instruction: str) -> bool:
+    min_tokens = MIN_CACHE_TOKENS.get(model_name, DEFAULT_MIN_CACHE_TOKENS)
+    return len(system_instruction) // CHARS_PER_TOKEN >= min_tokens
+
+def _create_model(model_name: str, system_instruction: str) -> genai.GenerativeModel:
+    try:
+        cache = caching.CachedContent.create(
+            model=f"models/{model_name}",
+            system_instruction=system_instruction,
+            ttl=CACHE_TTL
+        )
+        return genai.GenerativeModel.from_cached_content(cached_content=cache)
+    except Exception as e:
+        # e.g. a prefix just under the real token minimum; keep it as a system
+        # instruction so implicit prefix caching still applies, and retry next TTL.
+        print(f"[ContextCache] Using uncached {model_name}: {e}")
+        return genai.GenerativeModel(model_name, system_instruction=system_instruction)
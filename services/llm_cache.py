@@ -0,0 +1,69 @@
+import os
+import hashlib
+import inspect
+import functools
+import diskcache
+import orjson
+from typing import Any, Iterable
+
+CACHE_DIR = "./.llm_cache"
+
+_CACHE = diskcache.Cache(CACHE_DIR)
+
+def _bypassed() -> bool:
+    return os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+def _fingerprint(context: Iterable[Any]) -> str:
+    # Pydantic models contribute their JSON schema, anything else its str()
+    digest = hashlib.blake2b(digest_size=16)
+    for part in context:
+        if hasattr(part, "model_json_schema"):
+            part = orjson.dumps(part.model_json_schema(), option=orjson.OPT_SORT_KEYS).decode()
+        digest.update(f"{part}\n".encode())
+    return digest.hexdigest()
+
+def _cache_key(fn, fingerprint: str, prompt: str, args: tuple, kwargs: dict) -> str:
+    # Namespaced by method and by the static request context (model, system
+    # instruction, schema), so identical payloads sent to different agents, or
+    # to an agent whose prefix or schema changed, never collide
+    extra = repr((args, sorted(kwargs.items())))
+    return hashlib.blake2b(f"{fn.__qualname__}\n{fingerprint}\n{extra}\n{prompt}".encode(), digest_size=16).hexdigest()
+
+def llm_cache(ttl: int = 86400, context: Iterable[Any] = ()):
+    """
+    Caches the parsed result of an agent method `fn(self, prompt, ...)` on disk,
+    keyed on a hash of the rendered prompt, any extra arguments and `context`:
+    the parts of the request that are not in the prompt, e.g.
+    (MODEL_NAME, STATIC_PROMPT_PREFIX, OutputSchema).
+    Exceptions are never cached. Set LLM_CACHE_BYPASS=true to skip the cache.
+    """
+    fingerprint = _fingerprint(context)
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(self, prompt: str, *args, **kwargs):
+                if _bypassed():
+                    return await fn(self, prompt, *args, **kwargs)
+                key = _cache_key(fn, fingerprint, prompt, args, kwargs)
+                cached = _CACHE.get(key)
+                if cached is not None:
+                    return cached
+                result = await fn(self, prompt, *args, **kwargs)
+                _CACHE.set(key, result, expire=ttl)
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(self, prompt: str, *args, **kwargs):
+            if _bypassed():
+                return fn(self, prompt, *args, **kwargs)
+            key = _cache_key(fn, fingerprint, prompt, args, kwargs)
+            cached = _CACHE.get(key)
+            if cached is not None:
+                return cached
+            result = fn(self, prompt, *args, **kwargs)
+            _CACHE.set(key, result, expire=ttl)
+            return result
+        return wrapper
+    return decorator
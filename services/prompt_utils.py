@@ -0,0 +1,31 @@
+from typing import Any, List, Tuple
+
+# Keys whose string values hold page markup
+HTML_KEYS = ("html", "html_content")
+
+def truncate_evidence(data: Any, max_html: int = 8192, max_text: int = 4096, source: str = "evidence") -> Any:
+    """
+    Returns a copy of a JSON-like value with every string capped before it is
+    embedded in a prompt: markup under HTML_KEYS to max_html characters and any
+    other string to max_text. Logs the fields that were cut.
+    """
+    truncated: List[Tuple[str, int]] = []
+
+    def walk(value: Any, key: str = None) -> Any:
+        if isinstance(value, str):
+            limit = max_html if key in HTML_KEYS else max_text
+            if len(value) > limit:
+                truncated.append((key or "value", len(value)))
+                return value[:limit]
+            return value
+        if isinstance(value, dict):
+            return {k: walk(v, k) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [walk(v, key) for v in value]
+        return value
+
+    result = walk(data)
+    if truncated:
+        fields = ", ".join(f"{key} ({length} chars)" for key, length in truncated)
+        print(f"[Prompt] Truncated {source}: {fields}")
+    return result
@@ -1,18 +1,22 @@
-import os
 import uuid
+import threading
 import google.generativeai as genai
+from cachetools import TTLCache
 from typing import Dict, Any, List, Optional
-from dotenv import load_dotenv
+from services.gemini_models import configure
 
-load_dotenv()
+# Exchanges kept (besides the priming system turn) and re-sent with each message
+MAX_TURNS = 10
 
 class RecoveryChatService:
     def __init__(self):
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        configure()
         self.model = genai.GenerativeModel('gemini-2.5-pro')
-        # In-memory session storage (not persistent)
+        # In-memory session storage (not persistent), bounded; sessions idle for an hour expire
         # Structure: session_id -> { "chat": ChatSession, "context": Dict }
-        self._sessions: Dict[str, Any] = {}
+        self._sessions: TTLCache = TTLCache(maxsize=10000, ttl=3600)
+        # TTLCache is not thread-safe and Flask serves requests from several threads
+        self._lock = threading.RLock()
 
     def start_session(self, case_context: Dict[str, Any]) -> str:
         """
@@ -29,10 +33,11 @@ class RecoveryChatService:
             {"role": "model", "parts": ["Understood. I am ready to assist with recovery based on these strict guidelines."]}
         ])
         
-        self._sessions[session_id] = {
-            "chat": chat_session,
-            "context": case_context
-        }
+        with self._lock:
+            self._sessions[session_id] = {
+                "chat": chat_session,
+                "context": case_context
+            }
         
         return session_id
 
@@ -40,10 +45,12 @@ class RecoveryChatService:
         """
         Sends a user message to an active session.
         """
-        if session_id not in self._sessions:
-            raise ValueError("Session not found")
-        
-        session = self._sessions[session_id]
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise ValueError("Session not found")
+            # Re-inserting restarts the expiry, so only idle sessions are evicted
+            self._sessions[session_id] = session
         
         # Safety Check: Refuse sensitive info
         # (This is a basic regex check, Gemini will also be prompted to refuse)
@@ -55,10 +62,21 @@ class RecoveryChatService:
 
         try:
             response = session["chat"].send_message(user_message)
+            self._trim_history(session)
             return response.text
         except Exception as e:
             return f"I'm sorry, I encountered an error processing your request. Please try again. (Details: {str(e)})"
 
+    def _trim_history(self, session: Dict[str, Any]):
+        """
+        Restarts the chat with the system turn and only the last MAX_TURNS exchanges,
+        so each message re-sends a bounded history instead of the whole conversation.
+        """
+        history = session["chat"].history
+        if len(history) > 2 + 2 * MAX_TURNS:
+            # history[0:2] is the system prompt and its acknowledgement
+            session["chat"] = self.model.start_chat(history=history[:2] + history[-2 * MAX_TURNS:])
+
     def _build_system_prompt(self, context: Dict[str, Any]) -> str:
         """
         Constructs the strict system prompt.
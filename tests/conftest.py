@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Ensure we can import agents, services and schemas from the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
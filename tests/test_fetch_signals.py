@@ -0,0 +1,32 @@
+import pytest
+
+from mcp.tools.fetch import extract_page_signals
+
+COMMENTED_FORM = (
+    '<html><body><!-- <form><input type="password"> Sign in</form> amazon -->'
+    '<p>Welcome to Chase</p></body></html>'
+)
+
+@pytest.mark.parametrize("deep", [False, True])
+def test_commented_markup_is_ignored(deep):
+    signals = extract_page_signals("https://example.com", COMMENTED_FORM, deep=deep)
+    assert not signals["login_form_detected"]
+    assert not signals["password_field_detected"]
+    assert signals["brand_keywords_found"] == ["chase"]
+
+# Inline Google Tag Manager snippet and an Apple Pay button style on an ordinary page
+TAGGED_PAGE = (
+    "<html><head><script>(function(w,d,s,l,i){w[l]=w[l]||[];w[l].push({'gtm.start':"
+    "new Date().getTime(),event:'gtm.js'});var f=d.getElementsByTagName(s)[0],"
+    "j=d.createElement(s);j.async=true;j.src='https://www.googletagmanager.com/gtm.js?id='+i;"
+    "f.parentNode.insertBefore(j,f);})(window,document,'script','dataLayer','GTM-XXXX');</script>"
+    "<style>.apple-pay { -webkit-appearance: -apple-pay-button; }</style></head>"
+    "<body><template><p>Sign in with PayPal</p></template>"
+    "<form action='/session'><input name='user'><input type='password'></form></body></html>"
+)
+
+@pytest.mark.parametrize("deep", [False, True])
+def test_script_style_and_template_text_is_not_page_text(deep):
+    signals = extract_page_signals("https://example.com/login", TAGGED_PAGE, deep=deep)
+    assert signals["brand_keywords_found"] == []
+    assert signals["password_field_detected"]
@@ -0,0 +1,27 @@
+import pytest
+
+from agents import ingestion_agent
+from agents.ingestion_agent import EMAIL_RE, URL_RE, _scan_urls_and_emails
+
+ASCII_TEXTS = [
+    "Verify at http://paypal-verify.com/login, or mail support@paypal-verify.com.",
+    "Two links: https://a.example/x?y=1 (see https://b.example/).",
+    "Reply to a@b.c@d.e or first.last+tag@mail.example.co.uk",
+    '<a href="https://evil.example/login?next=%2F">Sign in</a><br>admin@evil.example',
+    "no entities here",
+]
+UNICODE_TEXTS = [
+    "Contact café@ex.com or visit https://exämple.com/pfad?q=ü",
+    "Écrivez à josé.garcía@correo.es — https://例え.jp/ログイン",
+]
+
+@pytest.mark.parametrize("text", ASCII_TEXTS + UNICODE_TEXTS)
+def test_scan_matches_re(text):
+    assert _scan_urls_and_emails(text) == (URL_RE.findall(text), EMAIL_RE.findall(text))
+
+@pytest.mark.parametrize("text", ASCII_TEXTS)
+def test_hyperscan_database_matches_re(text):
+    # The database module import compiled, not a test-only copy
+    pytest.importorskip("hyperscan")
+    assert ingestion_agent._HS_DB is not None
+    assert ingestion_agent._hs_scan(text) == (URL_RE.findall(text), EMAIL_RE.findall(text))
@@ -0,0 +1,67 @@
+import asyncio
+import orjson
+from agents import link_analyzer_agent
+from agents.link_analyzer_agent import LinkAnalyzerAgent, _match_results
+
+URL = "https://example.com/login"
+
+FINDING = {
+    "agent": "LinkAnalyzerAgent",
+    "url": URL,
+    "facts": {
+        "domain_age_days": 5,
+        "registrar": None,
+        "privacy_protection": False,
+        "redirect_chain": [],
+        "redirect_count": 0,
+        "login_form_detected": True,
+        "password_field_detected": True,
+        "brand_keywords_found": [],
+        "reachability": "reachable",
+        "technical_errors": []
+    }
+}
+
+class FakeResponse:
+    text = orjson.dumps({"results": [FINDING]}).decode()
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        self.calls += 1
+        return FakeResponse()
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        raise AssertionError("the SDK's async client is bound to the first event loop")
+
+def test_analyze_runs_in_a_fresh_event_loop_each_time(monkeypatch):
+    # Every pipeline run calls asyncio.run, so each analyze gets a new loop
+    monkeypatch.setenv("LLM_CACHE_BYPASS", "true")
+    model = FakeModel()
+    monkeypatch.setattr(link_analyzer_agent, "get_model", lambda *args: model)
+    monkeypatch.setattr(LinkAnalyzerAgent, "_post_mcp", lambda self, endpoint, payload: {})
+
+    agent = LinkAnalyzerAgent()
+    for _ in range(2):
+        findings = asyncio.run(agent.analyze([URL]))
+        assert findings == [FINDING]
+    assert model.calls == 2
+
+def _evidence(*urls):
+    return [{"url": url} for url in urls]
+
+def test_results_are_matched_by_url_when_reordered():
+    results = [{"url": "https://b.example", "n": 2}, {"url": "https://a.example", "n": 1}]
+    assert _match_results(_evidence("https://a.example", "https://b.example"), results) == [results[1], results[0]]
+
+def test_unmatched_result_fills_its_own_position_only():
+    # The model rewrote the second URL; it is taken by position, under the input URL
+    results = [{"url": "https://a.example", "n": 1}, {"url": "https://b.example/", "n": 2}]
+    matched = _match_results(_evidence("https://a.example", "https://b.example"), results)
+    assert matched == [results[0], {"url": "https://b.example", "n": 2}]
+
+def test_missing_result_is_none():
+    results = [{"url": "https://b.example", "n": 2}]
+    assert _match_results(_evidence("https://a.example", "https://b.example"), results) == [None, results[0]]
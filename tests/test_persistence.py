@@ -0,0 +1,80 @@
+import os
+import threading
+
+import orjson
+import pytest
+
+import app
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    # Fresh in-memory state and an empty data directory for each test
+    monkeypatch.chdir(tmp_path)
+    for name in ("ANALYSES_DB", "EVENTS_DB", "EVENT_FRAMES", "CONTENT_INDEX", "_last_fsync"):
+        monkeypatch.setattr(app, name, {})
+    monkeypatch.setattr(app, "_data_loaded", True)
+    monkeypatch.setattr(app, "_migration_pending", False)
+    monkeypatch.setattr(app, "_appends_since_compaction", 0)
+    monkeypatch.setattr(app, "_load_attempted", False)
+    return tmp_path
+
+def _logged_events(path):
+    with open(path, 'rb') as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+def test_compaction_during_record_event_does_not_duplicate(store, monkeypatch):
+    append_lines = app._append_lines
+    compaction = threading.Thread(target=app.compact_data)
+
+    def racing_append(path, lines):
+        # Compact from another thread between the in-memory and on-disk append
+        compaction.start()
+        compaction.join(timeout=0.2)
+        append_lines(path, lines)
+
+    monkeypatch.setattr(app, "_append_lines", racing_append)
+    app.EVENTS_DB["a1"] = []
+    app.EVENT_FRAMES["a1"] = []
+    app.record_event("a1", {"action": "started"})
+    compaction.join()
+
+    assert _logged_events(app.EVENTS_LOG_FILE) == [{"id": "a1", "event": {"action": "started"}}]
+
+def test_failed_migration_keeps_logs_unwritten(store, monkeypatch):
+    with open(app.LEGACY_ANALYSES_FILE, 'wb') as f:
+        f.write(b"{not json")
+    monkeypatch.setattr(app, "_data_loaded", False)
+    monkeypatch.setattr(app, "_migration_pending", True)
+
+    app.load_data()
+    app.append_analysis({"id": "a1", "createdAt": "2026-01-01T00:00:00"})
+    app.EVENTS_DB["a1"] = []
+    app.EVENT_FRAMES["a1"] = []
+    app.record_event("a1", {"action": "started"})
+
+    # The next start must still find only the legacy snapshot and migrate it
+    assert not os.path.exists(app.ANALYSES_LOG_FILE)
+    assert not os.path.exists(app.EVENTS_LOG_FILE)
+
+def test_migration_enables_appends(store, monkeypatch):
+    with open(app.LEGACY_ANALYSES_FILE, 'wb') as f:
+        f.write(orjson.dumps({"a1": {"id": "a1", "createdAt": "2026-01-01T00:00:00"}}))
+    monkeypatch.setattr(app, "_data_loaded", False)
+    monkeypatch.setattr(app, "_migration_pending", True)
+
+    app.load_data()
+    app.append_analysis({"id": "a2", "createdAt": "2026-01-02T00:00:00"})
+
+    assert [record["id"] for record in _logged_events(app.ANALYSES_LOG_FILE)] == ["a1", "a2"]
+
+def test_first_request_loads_and_migrates(store, monkeypatch):
+    # Started without __main__ (flask run, gunicorn), so nothing called load_data
+    with open(app.LEGACY_ANALYSES_FILE, 'wb') as f:
+        f.write(orjson.dumps({"a1": {"id": "a1", "createdAt": "2026-01-01T00:00:00"}}))
+    monkeypatch.setattr(app, "_data_loaded", False)
+    monkeypatch.setattr(app, "_migration_pending", True)
+
+    app.app.test_client().get("/api/analyses")
+    app.append_analysis({"id": "a2", "createdAt": "2026-01-02T00:00:00"})
+
+    assert [record["id"] for record in _logged_events(app.ANALYSES_LOG_FILE)] == ["a1", "a2"]
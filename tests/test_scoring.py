@@ -0,0 +1,47 @@
+import pytest
+
+from agents.scoring_agent import INSTANCE, _is_official
+
+@pytest.mark.parametrize("host, brand, official", [
+    ("paypal.com", "PayPal", True),
+    ("www.paypal.co.uk", "PayPal", True),
+    ("paypal-secure-verify.com", "PayPal", False),
+    ("mypaypal.net", "PayPal", False),
+    ("paypal-verify.com", "PayPal", False),
+    ("mybank-login.com", "bank", False),
+])
+def test_is_official(host, brand, official):
+    assert _is_official(host, brand) is official
+
+def test_upstream_errors_are_unknown():
+    result = INSTANCE.calculate_score({"error": "timeout"}, [{"url": "https://x.example", "error": "dns"}])
+    assert result["severity_label"] == "Unknown"
+    assert result["reasons"] == ["Extractor Error: timeout", "Link Analysis Error (https://x.example): dns"]
+
+PAYPAL = {"brand_impersonation": {"detected": True, "brand_name": "PayPal"}, "requested_actions": []}
+NO_BRAND = {"requested_actions": []}
+LOGIN_PAGE = {"login_form_detected": True, "password_field_detected": True, "domain_age_days": 5000}
+
+@pytest.mark.parametrize("indicators, url, facts", [
+    # Brands mentioned on a page are not brands the page claims to be
+    (NO_BRAND, "https://github.com/login", dict(LOGIN_PAGE, brand_keywords_found=["google", "apple"])),
+    (NO_BRAND, "https://www.bankofamerica.com/", dict(LOGIN_PAGE, brand_keywords_found=["bank"])),
+    (NO_BRAND, "https://news.example.com/apple-iphone-review", {"brand_keywords_found": ["apple"]}),
+    (PAYPAL, "https://www.paypal.co.uk/signin", dict(LOGIN_PAGE, brand_keywords_found=["paypal"])),
+])
+def test_legitimate_login_pages_are_not_phishing(indicators, url, facts):
+    result = INSTANCE.calculate_score(indicators, [{"url": url, "facts": facts}])
+    reasons = " ".join(result["reasons"])
+    assert "not an official" not in reasons and "outside its root domain" not in reasons
+    assert result["severity_label"] in ("Safe", "Low", "Medium")
+
+@pytest.mark.parametrize("indicators, url", [
+    (PAYPAL, "https://paypal-secure-verify.com/login"),
+    (PAYPAL, "https://mypaypal.net/"),
+    # No brand from the message; the hostname itself claims PayPal
+    (NO_BRAND, "http://paypal-verify.com/login"),
+])
+def test_look_alike_login_pages_are_credential_harvest(indicators, url):
+    result = INSTANCE.calculate_score(indicators, [{"url": url, "facts": dict(LOGIN_PAGE, brand_keywords_found=["paypal"])}])
+    assert any("not an official" in reason for reason in result["reasons"])
+    assert result["scam_type"] == "Phishing"